@@ -0,0 +1,196 @@
+"""Background acquisition of RGB images and point clouds."""
+
+
+import threading
+import time
+
+import numpy as np
+
+
+POLL_PERIOD = 0.005
+# largest difference of arrival times of an RGB image and the depth data
+# captured together with it, a camera frame is 33 ms apart
+PAIR_TOLERANCE = 0.01
+
+
+class Frame:
+    """RGB image with point cloud or depth image captured together."""
+
+    def __init__(self, stamp: float, rgb: np.ndarray, pc: np.ndarray,
+                 depth: np.ndarray = None) -> None:
+        """
+        Create Frame instance.
+
+        :param stamp: capture time from the clock of the grabber
+        :param rgb: RGB image
+        :param pc: point cloud, None if not acquired
+        :param depth: depth image, None if not acquired
+        """
+        self.stamp = stamp
+        self.rgb = rgb
+        self.pc = pc
+        self.depth = depth
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"Frame at {self.stamp:.3f}"
+
+
+class FrameGrabber:
+    """
+    Keep the newest Frame from the turtle in double-buffered slots.
+
+    The background thread fills the back slot and swaps it to the front, so
+    readers always get a complete Frame without blocking the acquisition.
+
+    A Frame is stamped with the time before waiting for its data. The turtle
+    gives no capture time, so the stamp is only an estimate: an image exposed
+    before the wait began but delayed in transport is stamped later than its
+    capture. Depth data arriving more than pair_tolerance after the image
+    belongs to a later camera frame, it is kept for the next image and the
+    current one is dropped.
+    """
+
+    def __init__(self, turtle: any, point_cloud: bool = True,
+                 depth: bool = False, clock: any = time.monotonic,
+                 pair_tolerance: float = PAIR_TOLERANCE) -> None:
+        """
+        Create FrameGrabber instance.
+
+        :param turtle: turtle instance
+        :param point_cloud: boolean for acquiring point cloud with the image
+        :param depth: boolean for acquiring depth image with the image
+        :param clock: function returning current time for frame stamps
+        :param pair_tolerance: largest difference of arrival times of data
+                               of one Frame in seconds
+        """
+        self.turtle = turtle
+        self.clock = clock
+        self.pair_tolerance = pair_tolerance
+        self.point_cloud = point_cloud
+        self.depth = depth
+        self.slots = [None, None]
+        self.front = 0
+        self.running = False
+        self.thread = None
+        self.new_frame = threading.Condition()
+        self.dropped = 0
+
+    def start(self) -> None:
+        """Start the acquisition thread."""
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """Stop the acquisition thread and wait for it."""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def receive(self, stream: str) -> tuple:
+        """
+        Wait for the next depth data.
+
+        :param stream: "pc" or "depth"
+        :return: data, time before waiting and time of arrival
+        """
+        start = self.clock()
+        if stream == "pc":
+            self.turtle.wait_for_point_cloud()
+            data = self.turtle.get_point_cloud()
+        else:
+            self.turtle.wait_for_depth_image()
+            data = self.turtle.get_depth_image()
+        return data, start, self.clock()
+
+    def pair(self, streams: list, pending: dict, received: float) -> dict:
+        """
+        Get depth data captured together with an image.
+
+        :param streams: names of the acquired depth streams
+        :param pending: depth data of later frames by stream, updated
+        :param received: time of arrival of the image
+        :return: dictionary of data, time before waiting and time of arrival
+                 by stream, None if the data belong to a later frame
+        """
+        items = {}
+        for name in streams:
+            item = pending.pop(name, None)
+            if item is None or received - item[2] > self.pair_tolerance:
+                item = self.receive(name)
+            if item[2] - received > self.pair_tolerance:
+                pending[name] = item
+                return None
+            items[name] = item
+        return items
+
+    def run(self) -> None:
+        """Acquisition loop, runs in the background thread."""
+        streams = [name for name, on in (("pc", self.point_cloud),
+                                         ("depth", self.depth)) if on]
+        pending = {}
+        last_rgb = None
+        depth_first = False
+        try:
+            while self.running and not self.turtle.is_shutting_down():
+                if depth_first:
+                    # depth data arrive before the image, wait for them first
+                    pending = {name: self.receive(name) for name in streams}
+                stamp = self.clock()
+                self.turtle.wait_for_rgb_image()
+                rgb = self.turtle.get_rgb_image()
+                received = self.clock()
+                if rgb is None or rgb is last_rgb:
+                    time.sleep(POLL_PERIOD)
+                    continue
+                last_rgb = rgb
+                items = self.pair(streams, pending, received)
+                if items is None:
+                    self.dropped += 1
+                    continue
+                stamp = min([stamp] + [i[1] for i in items.values()])
+                depth_first = any(i[2] < received for i in items.values())
+                pc, depth = (items[n][0] if n in items else None
+                             for n in ("pc", "depth"))
+
+                back = 1 - self.front
+                self.slots[back] = Frame(stamp, rgb, pc, depth)
+                with self.new_frame:
+                    self.front = back
+                    self.new_frame.notify_all()
+        finally:
+            # wake up readers waiting for a Frame that will never come
+            with self.new_frame:
+                self.running = False
+                self.new_frame.notify_all()
+
+    def latest(self) -> Frame:
+        """
+        Get the newest Frame without blocking.
+
+        :return: newest Frame or None if nothing was acquired yet
+        """
+        return self.slots[self.front]
+
+    def wait_newer(self, stamp: float = -np.inf,
+                   timeout: float = None) -> Frame:
+        """
+        Block until there is a Frame captured after stamp.
+
+        :param stamp: time from the clock of the grabber
+        :param timeout: maximal waiting time in seconds, None for no limit
+        :return: newest Frame or None on timeout
+        """
+        with self.new_frame:
+            done = self.new_frame.wait_for(
+                lambda: (self.latest() is not None and
+                         self.latest().stamp > stamp) or not self.running,
+                timeout)
+        frame = self.latest()
+        if not done or frame is None or frame.stamp <= stamp:
+            return None
+        return frame
@@ -0,0 +1,220 @@
+"""
+Offline batch detection of objects in recorded images and frame stores.
+
+Frames are processed by find_ball.find_objects in a pool of processes and
+the detections are written as JSON lines, one line per frame, or as
+columnar .npz with one row per detection. Throughput is reported at the end.
+
+Run from the repository root:
+    python batch_detect.py test_data -o detections.jsonl
+    python batch_detect.py capture.frames --positions -o detections.npz
+"""
+
+
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import cv2
+from find_ball import find_objects, get_color_lut
+from frame_store import FRAME_STORE_SUFFIX, FrameStore, mat_stamp
+import numpy as np
+from rigidobject import assign_xy_batch, assign_xy_depth
+import scipy.io
+
+
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg")
+MAT_SUFFIX = ".mat"
+# chunks of tasks sent to a worker at once, bounded for even load
+MAX_CHUNK = 16
+# columns of the .npz output, one row per detection
+COLUMNS = ("source", "index", "stamp", "type", "color",
+           "u", "v", "w", "h", "x", "y")
+
+_stores = {}
+
+
+def list_frames(inputs: list) -> list:
+    """
+    Expand inputs to a list of frames.
+
+    :param inputs: images, .mat files, frame stores or directories of them
+    :return: list of (path, index of the frame in the file)
+    """
+    tasks = []
+    for name in inputs:
+        if os.path.isdir(name):
+            files = sorted(os.path.join(root, f)
+                           for root, _, fs in os.walk(name) for f in fs)
+        else:
+            files = [name]
+        for path in files:
+            suffix = os.path.splitext(path)[1].lower()
+            if suffix == FRAME_STORE_SUFFIX:
+                tasks += [(path, i) for i in range(len(open_store(path)))]
+            elif suffix in IMAGE_SUFFIXES or suffix == MAT_SUFFIX:
+                tasks.append((path, 0))
+    return tasks
+
+
+def open_store(path: str) -> FrameStore:
+    """
+    Get frame store opened once per process.
+
+    :param path: file of the store
+    :return: FrameStore
+    """
+    if path not in _stores:
+        _stores[path] = FrameStore(path)
+    return _stores[path]
+
+
+def load_frame(path: str, index: int, positions: bool) -> tuple:
+    """
+    Load one frame.
+
+    :param path: image, .mat file or frame store
+    :param index: index of the frame in a frame store
+    :param positions: boolean, load point cloud or depth image as well
+    :return: stamp, RGB image, point cloud, depth image and its K, data
+             not available or not requested are None
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == FRAME_STORE_SUFFIX:
+        store = open_store(path)
+        frame = store[index]
+        if not positions:
+            return frame.stamp, frame.rgb, None, None, None
+        k = store.meta.get("K_depth")
+        return (frame.stamp, frame.rgb, frame.pc, frame.depth,
+                None if k is None else np.asarray(k))
+    if suffix == MAT_SUFFIX:
+        data = scipy.io.loadmat(path)
+        stamp = mat_stamp(data, path)[0]
+        if not positions:
+            return stamp, data["image_rgb"], None, None, None
+        return (stamp, data["image_rgb"], data.get("point_cloud"),
+                data.get("image_depth"), data.get("K_depth"))
+    return os.path.getmtime(path), cv2.imread(path), None, None, None
+
+
+def detect_frame(task: tuple) -> dict:
+    """
+    Detect objects in one frame, runs in a worker process.
+
+    :param task: path, index of the frame and boolean for positions
+    :return: JSON serializable detections of the frame
+    """
+    path, index, positions = task
+    stamp, rgb, pc, depth, k = load_frame(path, index, positions)
+    if rgb is None:
+        return {"source": path, "index": index, "stamp": stamp,
+                "error": "cannot read image", "objects": []}
+    objects = find_objects(rgb)
+    located = positions
+    if pc is not None:
+        assign_xy_batch(objects, pc)
+    elif depth is not None and k is not None:
+        assign_xy_depth(objects, depth, k)
+    else:
+        located = False
+    detections = []
+    for o in objects:
+        # null without positions or without any valid depth in the window
+        valid = located and o.is_valid()
+        detections.append({"type": o.o_type.name, "color": o.color,
+                           "u": int(o.im_p.x), "v": int(o.im_p.y),
+                           "w": int(o.w), "h": int(o.h),
+                           "x": float(o.p.x) if valid else None,
+                           "y": float(o.p.y) if valid else None})
+    return {"source": path, "index": index, "stamp": stamp,
+            "objects": detections}
+
+
+def detect(tasks: list, workers: int, positions: bool = False) -> iter:
+    """
+    Detect objects in all frames in a pool of processes.
+
+    :param tasks: list of (path, index) from list_frames
+    :param workers: number of processes, 1 runs in this process
+    :param positions: boolean, assign real-world coordinates as well
+    :return: iterator of detections of frames in the order of tasks
+    """
+    # build or load the lookup table once, workers inherit or load it
+    get_color_lut()
+    tasks = [(path, index, positions) for path, index in tasks]
+    if workers == 1:
+        yield from map(detect_frame, tasks)
+        return
+    chunk = min(max(len(tasks) // (4 * workers), 1), MAX_CHUNK)
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap(detect_frame, tasks, chunksize=chunk)
+
+
+def write_columns(filename: str, results: list) -> None:
+    """
+    Write detections as columns to .npz, one row per detection.
+
+    :param filename: output .npz file
+    :param results: detections of frames from detect
+    """
+    rows = [(r["source"], r["index"], r["stamp"], o["type"], o["color"],
+             o["u"], o["v"], o["w"], o["h"],
+             np.nan if o["x"] is None else o["x"],
+             np.nan if o["y"] is None else o["y"])
+            for r in results for o in r["objects"]]
+    columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    dtypes = (str, np.int64, np.float64, str, str, np.int32, np.int32,
+              np.int32, np.int32, np.float64, np.float64)
+    np.savez(filename, **{name: np.array(column, dtype=dtype)
+                          for name, column, dtype
+                          in zip(COLUMNS, columns, dtypes)})
+
+
+def main() -> None:
+    """Run the batch detection given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("inputs", nargs="+",
+                        help="images, .mat files, frame stores or "
+                             "directories of them")
+    parser.add_argument("-o", "--output",
+                        help="*.jsonl or *.npz, JSON lines to stdout "
+                             "by default")
+    parser.add_argument("-j", "--workers", type=int,
+                        default=os.cpu_count() or 1)
+    parser.add_argument("--positions", action="store_true",
+                        help="assign real-world coordinates from point "
+                             "clouds or depth images")
+    args = parser.parse_args()
+
+    tasks = list_frames(args.inputs)
+    if not tasks:
+        parser.error("no frames found")
+    columnar = args.output is not None and args.output.endswith(".npz")
+    out = (sys.stdout if args.output is None or columnar
+           else open(args.output, "w"))
+    start = time.perf_counter()
+    results = []
+    counts = collections.Counter()
+    for result in detect(tasks, args.workers, args.positions):
+        counts.update(o["type"] for o in result["objects"])
+        if columnar:
+            results.append(result)
+        else:
+            out.write(json.dumps(result, allow_nan=False) + "\n")
+    elapsed = time.perf_counter() - start
+    if columnar:
+        write_columns(args.output, results)
+    elif out is not sys.stdout:
+        out.close()
+    print(f"{len(tasks)} frames in {elapsed:.2f} s, "
+          f"{len(tasks) / elapsed:.1f} fps with {args.workers} workers, "
+          f"detections {dict(counts)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
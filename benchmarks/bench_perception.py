@@ -0,0 +1,237 @@
+"""
+Latency of the perception stages and accuracy of find_objects on test_data.
+
+Run from the repository root:
+    python -m benchmarks.bench_perception [--frames STORE] [--save FILE]
+    python -m benchmarks.bench_perception --baseline FILE
+
+Every image is processed repeatedly and the stages of find_ball are timed
+separately: segment (HSV classification by the lookup table), mask,
+contours, moments and depth lookup, and the whole find_objects as well.
+Detection counts are compared with test_data/labels.json. With --baseline
+the exit code is 1 when a stage got slower or the detections got worse.
+"""
+
+
+import argparse
+import collections
+import glob
+import json
+import os
+import sys
+import time
+
+import cv2
+from find_ball import (COLOR_BOUNDS, LABEL_BALL, find_objects,
+                       get_color_lut, label_mask, segment)
+from frame_store import FrameStore
+import numpy as np
+from rigidobject import RigidType, assign_xy_batch, assign_xy_depth
+
+
+DATA_DIR = "test_data"
+LABELS = os.path.join(DATA_DIR, "labels.json")
+STAGES = ("segment", "mask", "contours", "moments", "depth",
+          "find_objects")
+PERCENTILES = (50, 95, 99)
+# relative slow-down of p50 or p95 of a stage reported as a regression,
+# smaller absolute differences in ms are timer noise
+TOLERANCE = 0.25
+MIN_SLOWDOWN = 0.2
+# depth of the synthetic point cloud of images without one
+PLANE_DEPTH = 1.0
+
+
+def load_frames(stores: list) -> list:
+    """
+    Load images of test_data and frames of frame stores.
+
+    :param stores: frame stores of recorded frames
+    :return: list of (name, rgb, pc, depth, K of depth)
+    """
+    frames = []
+    for path in sorted(glob.glob(os.path.join(DATA_DIR, "**", "*.*"),
+                                 recursive=True)):
+        rgb = cv2.imread(path)
+        if rgb is not None:
+            frames.append((os.path.relpath(path, DATA_DIR), rgb,
+                           None, None, None))
+    for path in stores:
+        store = FrameStore(path)
+        k = store.meta.get("K_depth")
+        for i in range(len(store)):
+            frame = store[i]
+            frames.append((f"{path}:{i}", frame.rgb, frame.pc, frame.depth,
+                           None if k is None else np.asarray(k)))
+    return frames
+
+
+def run_stages(rgb: np.ndarray, pc: np.ndarray, depth: np.ndarray,
+               k: np.ndarray, times: dict) -> list:
+    """
+    Detect objects once while timing every stage.
+
+    :param rgb: RGB image
+    :param pc: point cloud, a plane is used for images without any
+    :param depth: depth image used when there is no point cloud
+    :param k: intrinsic matrix of the depth camera
+    :param times: lists of durations by stage, appended to
+    :return: detected objects
+    """
+    if pc is None and (depth is None or k is None):
+        pc = np.zeros(rgb.shape, dtype=np.float32)
+        pc[..., 2] = PLANE_DEPTH
+    t0 = time.perf_counter()
+    labels = segment(rgb)
+    t1 = time.perf_counter()
+    masks = [label_mask(labels, label)
+             for label in range(LABEL_BALL, len(COLOR_BOUNDS) + 1)]
+    t2 = time.perf_counter()
+    contours = [cv2.findContours(m, cv2.RETR_EXTERNAL,
+                                 cv2.CHAIN_APPROX_SIMPLE)[0] for m in masks]
+    t3 = time.perf_counter()
+    for c in contours[0]:
+        cv2.contourArea(c)
+        cv2.minEnclosingCircle(c)
+    for cs in contours[1:]:
+        for c in cs:
+            cv2.contourArea(c)
+            cv2.boundingRect(c)
+            cv2.moments(c)
+    t4 = time.perf_counter()
+    objects = find_objects(rgb)
+    t5 = time.perf_counter()
+    if pc is None:
+        assign_xy_depth(objects, depth, k)
+    else:
+        assign_xy_batch(objects, pc)
+    t6 = time.perf_counter()
+    for stage, duration in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3,
+                                        t6 - t5, t5 - t4)):
+        times[stage].append(duration)
+    return objects
+
+
+def latency(times: dict) -> dict:
+    """
+    Summarize durations of stages.
+
+    :param times: lists of durations by stage
+    :return: dictionary of percentiles in ms by stage
+    """
+    return {stage: {f"p{q}": 1000 * float(np.percentile(times[stage], q))
+                    for q in PERCENTILES}
+            for stage in STAGES}
+
+
+def accuracy(detections: dict, labels: dict) -> dict:
+    """
+    Compare detection counts with ground-truth labels.
+
+    A detection is matched up to the labeled count of its type in the image,
+    the rest are false positives.
+
+    :param detections: counters of detected types by image name
+    :param labels: labeled counts of types by image name
+    :return: labeled, detected and matched counts by type
+    """
+    result = {t.name: {"labeled": 0, "detected": 0, "matched": 0}
+              for t in RigidType}
+    for name, counts in labels.items():
+        if name not in detections:
+            continue
+        for t, entry in result.items():
+            entry["labeled"] += counts.get(t, 0)
+            entry["detected"] += detections[name][t]
+            entry["matched"] += min(counts.get(t, 0), detections[name][t])
+    return result
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Find regressions against a baseline.
+
+    :param result: result of this run
+    :param baseline: result of a saved run
+    :param tolerance: allowed relative slow-down of p50 and p95
+    :return: list of messages, empty without any regression
+    """
+    regressions = []
+    for stage, old in baseline["latency"].items():
+        for q in ("p50", "p95"):
+            new = result["latency"].get(stage, {}).get(q)
+            if (new is not None and new > old[q] * (1 + tolerance) and
+                    new - old[q] > MIN_SLOWDOWN):
+                regressions.append(f"{stage} {q} {old[q]:.2f} -> "
+                                   f"{new:.2f} ms")
+    for t, old in baseline["accuracy"].items():
+        new = result["accuracy"][t]
+        if new["matched"] < old["matched"]:
+            regressions.append(f"{t} matched {old['matched']} -> "
+                               f"{new['matched']}")
+        if (new["detected"] - new["matched"] >
+                old["detected"] - old["matched"]):
+            regressions.append(f"{t} false positives "
+                               f"{old['detected'] - old['matched']} -> "
+                               f"{new['detected'] - new['matched']}")
+    return regressions
+
+
+def main() -> None:
+    """Run the benchmark, print tables and compare with a baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20,
+                        help="runs of every frame")
+    parser.add_argument("--frames", nargs="+", default=[], metavar="STORE",
+                        help="frame stores of recorded frames to add")
+    parser.add_argument("--save", metavar="FILE",
+                        help="save the result as a new baseline")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="compare with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    with open(LABELS) as f:
+        labels = json.load(f)
+    frames = load_frames(args.frames)
+    get_color_lut()  # build or load the table outside of the timing
+    times = {stage: [] for stage in STAGES}
+    detections = {}
+    for _ in range(args.repeat):
+        for name, rgb, pc, depth, k in frames:
+            objects = run_stages(rgb, pc, depth, k, times)
+            detections[name] = collections.Counter(o.o_type.name
+                                                   for o in objects)
+    result = {"frames": len(frames), "repeat": args.repeat,
+              "latency": latency(times),
+              "accuracy": accuracy(detections, labels)}
+
+    print(f"{len(frames)} frames x {args.repeat}")
+    print(f"{'stage':>12} " + " ".join(f"{f'p{q} [ms]':>9}"
+                                       for q in PERCENTILES))
+    for stage, row in result["latency"].items():
+        print(f"{stage:>12} " + " ".join(f"{v:>9.2f}"
+                                         for v in row.values()))
+    print(f"{'type':>12} {'labeled':>9} {'detected':>9} {'matched':>9} "
+          f"{'recall':>9} {'precision':>9}")
+    for t, e in result["accuracy"].items():
+        recall = e["matched"] / e["labeled"] if e["labeled"] else 1.0
+        precision = e["matched"] / e["detected"] if e["detected"] else 1.0
+        print(f"{t:>12} {e['labeled']:>9} {e['detected']:>9} "
+              f"{e['matched']:>9} {recall:>9.2f} {precision:>9.2f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+        print("no regression against the baseline")
+
+
+if __name__ == "__main__":
+    main()
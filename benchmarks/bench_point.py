@@ -0,0 +1,100 @@
+"""
+Micro-benchmark of scalar Point operations against the former NumPy ones.
+
+Run from the repository root:
+    python -m benchmarks.bench_point
+"""
+
+
+import timeit
+
+import numpy as np
+from geometry import Point
+
+
+class NumpyPoint:
+    """Former implementation of the hot Point operations, for comparison."""
+
+    def __init__(self, x: float, y: float, angle: float = 0) -> None:
+        """
+        Create NumpyPoint instance.
+
+        :param x: x position
+        :param y: y position
+        :param angle: rotation of the vector
+        """
+        self.x = x
+        self.y = y
+        self.angle = angle
+
+    def __add__(self, point: 'NumpyPoint') -> 'NumpyPoint':
+        """Add another point to itself."""
+        return NumpyPoint(self.x + point.x, self.y + point.y, self.angle)
+
+    @property
+    def xy(self) -> np.ndarray:
+        """Get x, y coordinates."""
+        return np.array((self.x, self.y))
+
+    @property
+    def sin(self) -> float:
+        """Get sin of the point angle."""
+        return np.sin(self.angle)
+
+    @property
+    def cos(self) -> float:
+        """Get cos of the point angle."""
+        return np.cos(self.angle)
+
+    def add_angle(self, angle: float) -> None:
+        """Update angle by adding another one."""
+        new = self.angle + angle
+        self.angle = np.arctan2(np.sin(new), np.cos(new))
+
+    def distance(self, point: 'NumpyPoint') -> float:
+        """Calculate distance from a point."""
+        return np.sqrt(np.sum(np.power(self.xy - point.xy, 2)))
+
+
+def pose_updates(cls: type, steps: int = 1000) -> None:
+    """
+    Integrate poses like Robot.update_odometry_linear/angular do.
+
+    :param cls: point class
+    :param steps: number of updates
+    """
+    pos = cls(0, 0, 0)
+    for _ in range(steps):
+        pos = pos + cls(0.01 * pos.cos, 0.01 * pos.sin)
+        pos.add_angle(0.01)
+
+
+def distance_loop(cls: type, count: int = 100) -> None:
+    """
+    Compare every point with every other like the merge loop in Map.
+
+    :param cls: point class
+    :param count: number of points
+    """
+    points = [cls(i * 0.1, i * 0.05) for i in range(count)]
+    for a in points:
+        for b in points:
+            a.distance(b)
+
+
+def main() -> None:
+    """Run the benchmark and print a table."""
+    print(f"{'operation':<16} {'numpy [ms]':>11} {'math [ms]':>10} "
+          f"{'speed-up':>9}")
+    for name, func in (("pose updates", pose_updates),
+                       ("distance loop", distance_loop)):
+        old = min(timeit.repeat(lambda: func(NumpyPoint),
+                                number=5, repeat=5)) / 5
+        new = min(timeit.repeat(lambda: func(Point),
+                                number=5, repeat=5)) / 5
+        print(f"{name:<16} {old * 1e3:>11.2f} {new * 1e3:>10.2f} "
+              f"{old / new:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Clustering backends merging repeated observations, used in mapping.py."""
+
+
+import math
+from enum import Enum
+
+import numpy as np
+from geometry import Point
+from rigidobject import RigidObject
+
+
+def average(object_a: RigidObject, object_b: RigidObject) -> Point:
+    """
+    Get an averagely estimated RigidObject from among two RigidObjects.
+
+    :param object_a: first reference RigidObject
+    :param object_b: second reference RigidObject
+    :return: RigidObject estimate
+    """
+    return Point(*np.mean([object_a.xy, object_b.xy], axis=0))
+
+
+class ClusterMode(Enum):
+    """Enum of clustering backends."""
+
+    GREEDY = 1
+    GRID = 2
+
+
+class GreedyClusters:
+    """
+    Reference backend comparing a new object with every cluster.
+
+    A new object is averaged into all clusters closer than threshold, or
+    starts a new cluster when none is close.
+    """
+
+    def __init__(self, threshold: float) -> None:
+        """
+        Create GreedyClusters instance.
+
+        :param threshold: maximal distance of merged objects
+        """
+        self.threshold = threshold
+        self.objects = []
+        self.counter = []
+
+    def candidates(self, point: Point) -> list:
+        """
+        Get indices of clusters possibly closer to point than threshold.
+
+        :param point: reference point
+        :return: ascending indices of clusters
+        """
+        return range(len(self.objects))
+
+    def moved(self, k: int, old_position: Point) -> None:
+        """
+        Notify that cluster k has moved.
+
+        :param k: index of the cluster
+        :param old_position: position before the move
+        """
+
+    def created(self, k: int) -> None:
+        """
+        Notify that cluster k was created.
+
+        :param k: index of the cluster
+        """
+
+    def add(self, object_a: RigidObject) -> None:
+        """
+        Merge a new object into clusters.
+
+        :param object_a: the new object
+        """
+        is_merged = False
+        for k in self.candidates(object_a.position):
+            x = self.objects[k]
+            # merge into existing object
+            if object_a.position.distance(x.position) < self.threshold:
+                old_position = x.position
+                x.set_position(average(x, object_a))
+                self.counter[k] += 1
+                self.moved(k, old_position)
+                is_merged = True
+        if not is_merged:
+            self.objects.append(object_a.copy())
+            self.counter.append(1)
+            self.created(len(self.objects) - 1)
+
+
+class GridClusters(GreedyClusters):
+    """
+    Backend looking up clusters in a uniform grid hash.
+
+    Cells are as large as threshold, so only clusters in the 3x3 neighborhood
+    of the new object are compared. Clusters are visited in the same order
+    as by GreedyClusters, which makes the results identical.
+    """
+
+    def __init__(self, threshold: float) -> None:
+        """
+        Create GridClusters instance.
+
+        :param threshold: maximal distance of merged objects
+        """
+        super().__init__(threshold)
+        self.cells = {}
+
+    def cell(self, point: Point) -> tuple:
+        """
+        Get grid cell of a point.
+
+        :param point: reference point
+        :return: integer cell coordinates
+        """
+        return (math.floor(point.x / self.threshold),
+                math.floor(point.y / self.threshold))
+
+    def candidates(self, point: Point) -> list:
+        """
+        Get indices of clusters in the neighboring cells of point.
+
+        :param point: reference point
+        :return: ascending indices of clusters
+        """
+        cx, cy = self.cell(point)
+        found = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                found.extend(self.cells.get((cx + dx, cy + dy), ()))
+        return sorted(found)
+
+    def moved(self, k: int, old_position: Point) -> None:
+        """
+        Move cluster k to the cell of its new position.
+
+        :param k: index of the cluster
+        :param old_position: position before the move
+        """
+        old_cell = self.cell(old_position)
+        new_cell = self.cell(self.objects[k].position)
+        if old_cell != new_cell:
+            self.cells[old_cell].remove(k)
+            self.cells.setdefault(new_cell, []).append(k)
+
+    def created(self, k: int) -> None:
+        """
+        Put cluster k into its cell.
+
+        :param k: index of the cluster
+        """
+        self.cells.setdefault(self.cell(self.objects[k].position),
+                              []).append(k)
+
+
+BACKENDS = {
+    ClusterMode.GREEDY: GreedyClusters,
+    ClusterMode.GRID: GridClusters,
+}
@@ -11,16 +11,23 @@ ANGULAR_CORRECTION = 1  # 1.04  # 1.18
 POSITION_NAMES = ['LEFT', 'CENTER', 'RIGHT']
 STATE_NAMES = ['RELEASED', 'PRESSED']
 BASE_POSITION = Point(0, 0, np.pi / 2)
+CONTROL_RATE = 50
 LINEAR_EPSILON = 0.01
 ANGULAR_EPSILON = 0.03
 MIN_LINEAR_VELOCITY = 0.1
 MAX_LINEAR_VELOCITY = 0.4
 MIN_ANGULAR_VELOCITY = 0.35
 MAX_ANGULAR_VELOCITY = 1
+MAX_LINEAR_ACCELERATION = 0.5
+MAX_ANGULAR_ACCELERATION = 2
 LINEAR_KP = 1.5
 LINEAR_KD = 0.5
 ANGULAR_KP = 1.8  # 0.8
 ANGULAR_KD = 0.3  # 0.3
+PATH_LOOKAHEAD = 0.3
+PATH_GOAL_TOLERANCE = 0.03
+PATH_KP = 1.5
+SCAN_ANGULAR_VELOCITY = 0.4
 
 # mapping.py
 MAX_OBJECTS = {RigidType.POLE: 2, RigidType.BALL: 1}
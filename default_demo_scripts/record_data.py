@@ -1,6 +1,7 @@
 from __future__ import print_function
 
 from datetime import datetime
+import time
 
 from robolab_turtlebot import Turtlebot, sleep
 
@@ -16,6 +17,7 @@ sleep(2)
 data = dict()
 data['K_rgb'] = turtle.get_rgb_K()
 data['K_depth'] = turtle.get_depth_K()
+data['stamp'] = time.time()  # capture time, see frame_store.py
 data['image_rgb'] = turtle.get_rgb_image()
 data['image_depth'] = turtle.get_depth_image()
 data['point_cloud'] = turtle.get_point_cloud()
@@ -0,0 +1,34 @@
+"""
+Record a log of all sensor data, see recording.py.
+
+Usage: python record_log.py [SECONDS] [--pc]
+
+Images and depth images are recorded by default, --pc adds point clouds.
+Convert the log for find_ball.load_img with
+    python frame_store.py OUT.frames LOG
+"""
+
+from datetime import datetime
+import sys
+
+from recording import Recorder, RecordingTurtle
+from robolab_turtlebot import Turtlebot, sleep
+
+args = [a for a in sys.argv[1:] if a != "--pc"]
+duration = float(args[0]) if args else 10.0
+point_cloud = "--pc" in sys.argv[1:]
+
+# initialize turlebot
+turtle = Turtlebot(rgb=True, depth=True, pc=point_cloud)
+
+# sleep 2 set to receive images
+sleep(2)
+
+path = datetime.today().strftime("%Y-%m-%d-%H-%M-%S")
+turtle = RecordingTurtle(turtle, Recorder(path), point_cloud=point_cloud)
+turtle.get_odometry()
+sleep(duration)
+turtle.get_odometry()
+turtle.close()
+
+print(f"{turtle.recorder} saved in {path}")
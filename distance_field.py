@@ -0,0 +1,141 @@
+"""Rasterized signed distance to danger zones, used in mapping.py."""
+
+
+import numpy as np
+from geometry import CircleArray, Point, PointArray
+
+
+FIELD_RESOLUTION = 0.02
+FIELD_MARGIN = 0.5
+
+
+class DistanceField:
+    """
+    Signed distance to the nearest danger zone sampled on a regular grid.
+
+    Distance is negative inside a zone. Queries are bilinear lookups whose
+    error is below error (the cell diagonal); points outside the raster are
+    farther than margin from all zones and are computed exactly. The lookups
+    are only used to rule out points and routes clearly away from the zones,
+    the rest is decided exactly.
+    """
+
+    def __init__(self, zones: list, resolution: float = FIELD_RESOLUTION,
+                 margin: float = FIELD_MARGIN) -> None:
+        """
+        Create DistanceField instance.
+
+        :param zones: list of danger zones (Circles)
+        :param resolution: size of a raster cell in meters
+        :param margin: distance of raster border from the zones
+        """
+        self.resolution = resolution
+        # interpolated distance of a 1-Lipschitz function is off by less
+        # than the distance to the farthest corner of the cell
+        self.error = resolution * np.sqrt(2)
+        self.circles = CircleArray.from_circles(zones)
+        self.centers = self.circles.c.xy
+        self.radii = self.circles.r
+        if zones:
+            low = np.min(self.centers - self.radii[:, None], axis=0) - margin
+            high = np.max(self.centers + self.radii[:, None], axis=0) + margin
+        else:
+            low, high = np.zeros(2), np.zeros(2)
+        self.origin = low
+        shape = np.ceil((high - low) / resolution).astype(int) + 1
+        xs = low[0] + np.arange(shape[0]) * resolution
+        ys = low[1] + np.arange(shape[1]) * resolution
+        self.field = np.full((shape[1], shape[0]), np.inf)
+        for (cx, cy), r in zip(self.centers, self.radii):
+            np.minimum(self.field,
+                       np.hypot(xs[None, :] - cx, ys[:, None] - cy) - r,
+                       out=self.field)
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return (f"DistanceField {self.field.shape[1]}x{self.field.shape[0]} "
+                f"at {self.resolution} m")
+
+    def exact(self, xy: np.ndarray) -> np.ndarray:
+        """
+        Compute signed distance of points directly from the zones.
+
+        :param xy: points, shape (n, 2)
+        :return: signed distances, shape (n,)
+        """
+        if not len(self.radii):
+            return np.full(len(xy), np.inf)
+        distance = self.circles.c.distance(PointArray(xy))
+        return np.min(distance - self.radii[:, None], axis=0)
+
+    def sample(self, xy: np.ndarray) -> np.ndarray:
+        """
+        Look up signed distance of many points at once.
+
+        :param xy: points, shape (n, 2)
+        :return: signed distances, shape (n,)
+        """
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        grid = (xy - self.origin) / self.resolution
+        cell = np.floor(grid).astype(int)
+        rows, cols = self.field.shape
+        inside = ((cell[:, 0] >= 0) & (cell[:, 0] < cols - 1) &
+                  (cell[:, 1] >= 0) & (cell[:, 1] < rows - 1))
+        result = np.empty(len(xy))
+        if np.any(~inside):
+            result[~inside] = self.exact(xy[~inside])
+        c, f = cell[inside], grid[inside] - cell[inside]
+        x0, y0 = c[:, 0], c[:, 1]
+        top = (self.field[y0, x0] * (1 - f[:, 0]) +
+               self.field[y0, x0 + 1] * f[:, 0])
+        bottom = (self.field[y0 + 1, x0] * (1 - f[:, 0]) +
+                  self.field[y0 + 1, x0 + 1] * f[:, 0])
+        result[inside] = top * (1 - f[:, 1]) + bottom * f[:, 1]
+        return result
+
+    def clearance(self, point: Point) -> float:
+        """
+        Get distance of a point from the nearest danger zone.
+
+        :param point: reference point
+        :return: signed distance, negative inside a zone
+        """
+        return float(self.sample(((point.x, point.y),))[0])
+
+    def is_inner(self, point: Point) -> bool:
+        """
+        Decide whether a point lies in any of the danger zones.
+
+        Points near a zone are decided exactly as by Circle.is_inner.
+
+        :param point: reference point
+        :return: boolean
+        """
+        if self.clearance(point) > self.error:
+            return False
+        return bool(np.any(self.circles.is_inner(
+            PointArray(((point.x, point.y),)))))
+
+    def route_clear(self, route: list, clearance: float = 0) -> bool:
+        """
+        Decide with one vectorized lookup that a route is surely clear.
+
+        Segments are sampled at half of the resolution, so every point of
+        the route is within a quarter of the resolution from a sample.
+
+        :param route: list of positions along the route
+        :param clearance: required distance from danger zones
+        :return: boolean, True if the whole route is farther than clearance
+                 from all zones, False if it may not be
+        """
+        if len(route) < 2:
+            return True
+        points = np.array([(p.x, p.y) for p in route])
+        samples = [points[-1:]]
+        for a, b in zip(points[:-1], points[1:]):
+            count = max(int(np.ceil(2 * np.hypot(*(b - a)) /
+                                    self.resolution)), 1)
+            t = np.arange(count)[:, None] / count
+            samples.append(a + t * (b - a))
+        margin = clearance + self.error + self.resolution / 4
+        return bool(np.all(self.sample(np.concatenate(samples)) > margin))
@@ -6,6 +6,7 @@ Used for testing.
 
 
 from datetime import datetime
+import time
 
 from scipy.io import savemat
 from robolab_turtlebot import Turtlebot, sleep, Rate
@@ -30,6 +31,8 @@ if __name__ == "__main__":
             data = dict()
             data['K_rgb'] = turtle_.get_rgb_K()
             data['K_depth'] = turtle_.get_depth_K()
+            # capture time, see frame_store.py
+            data['stamp'] = time.time()
             data['image_rgb'] = turtle_.get_rgb_image()
             data['image_depth'] = turtle_.get_depth_image()
             data['point_cloud'] = turtle_.get_point_cloud()
@@ -6,6 +6,7 @@ Expected behavior: go around half a circle and make 3 RGBd images
 
 
 import sys
+import time
 
 from scipy.io import savemat
 from robolab_turtlebot import Turtlebot, sleep, Rate
@@ -57,6 +58,7 @@ def save_telemetry(fn: str = "default.mat") -> None:
     data = dict()
     data['K_rgb'] = turtle.get_rgb_K()
     data['K_depth'] = turtle.get_depth_K()
+    data['stamp'] = time.time()  # capture time, see frame_store.py
     data['image_rgb'] = turtle.get_rgb_image()
     data['image_depth'] = turtle.get_depth_image()
     data['point_cloud'] = turtle.get_point_cloud()
@@ -1,6 +1,9 @@
 """Computer vision module based on cv2."""
 
 
+import hashlib
+import os
+
 import cv2
 import numpy as np
 from rigidobject import ColorType, RigidObject, RigidType
@@ -30,7 +33,17 @@ COLOR_BOUNDS_OBST = (
 COLOR_BOUND_BALL = ColorMaskBounding((21, 140, 80), (30, 255, 255),
                                      ColorType.YELLOW)
 
+# all bounds classified together, label of a bound is its index + 1
+COLOR_BOUNDS = (COLOR_BOUND_BALL,) + COLOR_BOUNDS_OBST
+LABEL_NONE = 0
+LABEL_BALL = 1
 
+LUT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             ".lut_cache")
+LUT_LAYOUT = "bgr24le"
+_color_lut = {}
+# frame stores opened by load_img, by file name
+_frame_stores = {}
 
 MIN_AREA_OBST = 200
 MIN_AREA_BALL = 800
@@ -38,20 +51,132 @@ MIN_AREA_BALL = 800
 TOP_Y_BORDER = 1 / 6
 BOTTOM_Y_BORDER = 7 / 8
 
+# ball tracking window, half size relative to ball radius and minimum in px
+TRACK_MARGIN = 2
+TRACK_MIN_HALF = 40
+
+
+def bounds_hash(bounds: tuple = COLOR_BOUNDS) -> str:
+    """
+    Hash the color bounds, used as a key of the cached lookup table.
+
+    :param bounds: tuple of ColorMaskBounding
+    :return: hex digest
+    """
+    key = repr([LUT_LAYOUT] + [(b.lb, b.ub, b.c.value) for b in bounds])
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def build_color_lut(bounds: tuple = COLOR_BOUNDS) -> np.ndarray:
+    """
+    Classify the whole BGR cube into labels.
+
+    Every 8-bit BGR color is converted to HSV once and thresholded by each
+    bound, the label of a bound is its index + 1.
 
-def find_ball(rgb_img: np.ndarray, all_objects: list) -> None:
+    :param bounds: tuple of ColorMaskBounding
+    :return: flat uint8 table indexed by (r << 16) | (g << 8) | b
+    """
+    cube = np.arange(1 << 24, dtype=np.uint32)
+    bgr = np.stack((cube & 0xFF, (cube >> 8) & 0xFF, cube >> 16),
+                   axis=-1).astype(np.uint8).reshape(4096, 4096, 3)
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+    lut = np.zeros((4096, 4096), dtype=np.uint8)
+    for label, bound in enumerate(bounds, start=1):
+        lut[cv2.inRange(hsv, bound.lb, bound.ub) > 0] = label
+    return lut.reshape(-1)
+
+
+def get_color_lut(bounds: tuple = COLOR_BOUNDS) -> np.ndarray:
+    """
+    Get lookup table for bounds, build it or load it from disk cache.
+
+    :param bounds: tuple of ColorMaskBounding
+    :return: flat uint8 lookup table, see build_color_lut
+    """
+    key = bounds_hash(bounds)
+    if key in _color_lut:
+        return _color_lut[key]
+
+    path = os.path.join(LUT_CACHE_DIR, f"color_lut_{key}.npy")
+    try:
+        lut = np.load(path)
+    except (OSError, ValueError):
+        lut = build_color_lut(bounds)
+        try:
+            os.makedirs(LUT_CACHE_DIR, exist_ok=True)
+            np.save(path, lut)
+        except OSError:
+            pass  # read-only checkout, keep the table in memory only
+    _color_lut[key] = lut
+    return lut
+
+
+def segment(rgb_img: np.ndarray) -> np.ndarray:
+    """
+    Classify every pixel of rgb_img into a label image.
+
+    Pixels are classified by a single gather from the precomputed lookup
+    table, labels are indices of COLOR_BOUNDS shifted by one, LABEL_NONE
+    marks unclassified pixels.
+
+    :param rgb_img: RGB image
+    :return: label image of the same height and width as rgb_img
+    """
+    # BGRA pixel read as little-endian uint32 is (a << 24) | (r << 16) | ...
+    bgra = cv2.cvtColor(np.asarray(rgb_img, dtype=np.uint8),
+                        cv2.COLOR_BGR2BGRA)
+    index = bgra.view("<u4")[..., 0]
+    index &= 0xFFFFFF
+    return np.take(get_color_lut(), index)
+
+
+def label_mask(labels: np.ndarray, label: int) -> np.ndarray:
+    """
+    Get binary mask of one label usable by cv2.findContours.
+
+    :param labels: label image
+    :param label: requested label
+    :return: mask with 255 where labels equal label
+    """
+    return cv2.compare(labels, label, cv2.CMP_EQ)
+
+
+def ball_window(ball: RigidObject, shift: int, shape: tuple) -> tuple:
+    """
+    Predict the window where ball should be found in the next frame.
+
+    :param ball: ball found in the last frame
+    :param shift: expected horizontal move of the ball in px
+    :param shape: shape of the image
+    :return: window (x0, y0, x1, y1) clipped to the image
+    """
+    half = max(int(ball.w * TRACK_MARGIN), TRACK_MIN_HALF) + abs(shift)
+    x, y = ball.im_p.x + shift, ball.im_p.y
+    return (max(x - half, 0), max(y - half, 0),
+            min(x + half, shape[1]), min(y + half, shape[0]))
+
+
+def find_ball(rgb_img: np.ndarray, all_objects: list,
+              labels: np.ndarray = None, window: tuple = None) -> None:
     """
     Find and add ball to all_objects.
 
     :param rgb_img: RGB image
     :param all_objects: list of objects
+    :param labels: label image from segment, computed when not given
+    :param window: search only in (x0, y0, x1, y1), whole image by default
     """
-    # Convert to HSV
-    hsv = cv2.cvtColor(rgb_img, cv2.COLOR_BGR2HSV)
-    mask = cv2.inRange(hsv, COLOR_BOUND_BALL.lb, COLOR_BOUND_BALL.ub)
+    x0, y0, x1, y1 = window if window is not None else (
+        0, 0, rgb_img.shape[1], rgb_img.shape[0])
+    if labels is None:
+        labels = segment(rgb_img[y0:y1, x0:x1])
+    else:
+        labels = labels[y0:y1, x0:x1]
+    mask = label_mask(labels, LABEL_BALL)
 
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL,
-                                   cv2.CHAIN_APPROX_SIMPLE)
+                                   cv2.CHAIN_APPROX_SIMPLE, offset=(x0, y0))
     contours = list(c for c in contours if cv2.contourArea(c) > MIN_AREA_BALL)
     contours.sort(key=cv2.contourArea, reverse=True)
 
@@ -64,17 +189,19 @@ def find_ball(rgb_img: np.ndarray, all_objects: list) -> None:
             break
 
 
-def find_obstacles(rgb_img: np.ndarray, all_objects: list) -> None:
+def find_obstacles(rgb_img: np.ndarray, all_objects: list,
+                   labels: np.ndarray = None) -> None:
     """
     Find and add obstacles to all_objects.
 
     :param rgb_img: RGB image
     :param all_objects: list of objects
+    :param labels: label image from segment, computed when not given
     """
-    for bound in COLOR_BOUNDS_OBST:
-        # Convert to HSV
-        hsv = cv2.cvtColor(rgb_img, cv2.COLOR_BGR2HSV)
-        mask = cv2.inRange(hsv, bound.lb, bound.ub)
+    if labels is None:
+        labels = segment(rgb_img)
+    for label, bound in enumerate(COLOR_BOUNDS_OBST, start=LABEL_BALL + 1):
+        mask = label_mask(labels, label)
 
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL,
                                        cv2.CHAIN_APPROX_SIMPLE)
@@ -168,13 +295,24 @@ def show_objects(rgb_img: np.ndarray,
         cv2.waitKey(5)  # & 0xFF == ord('q')
 
 
-def load_img(filename: str) -> np.ndarray:
+def load_img(filename: str, index: int = 0) -> np.ndarray:
     """
     Load matlab .mat file as though as it was regular RGB image.
 
-    :param filename: filepath to matlab .mat file
+    A frame store is memory-mapped instead and only the RGB image of frame
+    index is read, as a read-only view. The store is opened once and kept
+    open for later frames.
+
+    :param filename: filepath to matlab .mat file or frame store
+    :param index: index of the frame in a frame store
     :return: RGB image
     """
+    # FRAME_STORE_SUFFIX, frame_store is imported only when it is needed
+    if filename.endswith(".frames"):
+        if filename not in _frame_stores:
+            from frame_store import FrameStore
+            _frame_stores[filename] = FrameStore(filename)
+        return _frame_stores[filename].rgb(index)
     data = scipy.io.loadmat(filename)
     rgb_img = data["image_rgb"]
     return rgb_img
@@ -188,8 +326,9 @@ def find_objects(rgb_img: np.ndarray) -> list:
     :return: list of objects
     """
     all_objects = []
-    find_ball(rgb_img, all_objects)
-    find_obstacles(rgb_img, all_objects)
+    labels = segment(rgb_img)
+    find_ball(rgb_img, all_objects, labels)
+    find_obstacles(rgb_img, all_objects, labels)
     return all_objects
 
 
@@ -0,0 +1,309 @@
+"""
+Memory-mapped store of captured frames.
+
+The store is one file with a fixed-size header followed by one contiguous
+array per stream (stamp, rgb, depth, pc), each starting on a page boundary.
+Reading maps the arrays with np.memmap, so frame N or only its RGB image is
+a view into the file and nothing is loaded until it is touched.
+
+Convert .mat snapshots or a recorded mission log with:
+    python frame_store.py OUT.frames INPUT [INPUT ...]
+"""
+
+
+import argparse
+import glob
+import json
+import os
+import struct
+
+from acquisition import Frame
+import numpy as np
+from recording import LogReader, closest_index
+import scipy.io
+
+
+MAGIC = b"TBFRAMES"
+STORE_VERSION = 1
+HEADER_SIZE = 4096
+ALIGNMENT = 4096
+FRAME_STORE_SUFFIX = ".frames"
+
+STAMP_STREAM = "stamp"
+# streams of a frame and the keys of .mat snapshots holding them
+MAT_KEYS = {"rgb": "image_rgb", "depth": "image_depth", "pc": "point_cloud"}
+# key of the capture time in .mat snapshots, seconds since the epoch written
+# by record_data.py and the example scripts, older snapshots do not have it
+MAT_STAMP_KEY = "stamp"
+# meta flag of stores whose stamps are file modification times
+PLACEHOLDER_STAMPS = "placeholder_stamps"
+
+
+def align(offset: int) -> int:
+    """
+    Round offset up to the next page boundary.
+
+    :param offset: offset in bytes
+    :return: aligned offset
+    """
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class FrameStoreWriter:
+    """
+    Writer of a frame store with a fixed capacity.
+
+    The file is allocated for capacity frames at once and the frames are
+    written through memory maps, the header with the real count of frames
+    is written by close.
+    """
+
+    def __init__(self, path: str, capacity: int, streams: dict,
+                 meta: dict = None) -> None:
+        """
+        Create FrameStoreWriter instance.
+
+        :param path: file of the store, overwritten
+        :param capacity: maximal number of frames
+        :param streams: dictionary of (shape, dtype) of a frame by stream
+        :param meta: additional JSON serializable data, e.g. K matrices
+        """
+        self.path = path
+        self.capacity = capacity
+        self.meta = {k: np.asarray(v).tolist()
+                     for k, v in (meta or {}).items()}
+        self.count = 0
+        self.layout = {}
+        offset = HEADER_SIZE
+        for name, (shape, dtype) in {STAMP_STREAM: ((), np.float64),
+                                     **streams}.items():
+            dtype = np.dtype(dtype)
+            self.layout[name] = {"dtype": dtype.str,
+                                 "shape": [int(n) for n in shape],
+                                 "offset": offset}
+            offset = align(offset + capacity * dtype.itemsize *
+                           int(np.prod(shape)))
+        with open(path, "wb") as f:
+            f.truncate(offset)
+        self.arrays = {
+            name: np.memmap(path, dtype=np.dtype(s["dtype"]), mode="r+",
+                            offset=s["offset"],
+                            shape=(capacity, *s["shape"]))
+            for name, s in self.layout.items()} if capacity else {}
+        self.write_header()
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return (f"FrameStoreWriter of {self.count}/{self.capacity} frames "
+                f"to {self.path}")
+
+    def write_header(self) -> None:
+        """Write the header with the current count of frames."""
+        info = json.dumps({"count": self.count, "capacity": self.capacity,
+                           "streams": self.layout,
+                           "meta": self.meta}).encode()
+        header = MAGIC + struct.pack("<II", STORE_VERSION, len(info)) + info
+        if len(header) > HEADER_SIZE:
+            raise ValueError(f"Header of {len(header)} B does not fit "
+                             f"in {HEADER_SIZE} B")
+        with open(self.path, "r+b") as f:
+            f.write(header.ljust(HEADER_SIZE, b"\0"))
+
+    def append(self, stamp: float, **frames: np.ndarray) -> None:
+        """
+        Add one frame.
+
+        :param stamp: capture time of the frame
+        :param frames: data of every stream of the store by its name
+        """
+        if self.count >= self.capacity:
+            raise IndexError(f"Frame store is full ({self.capacity} frames)")
+        self.arrays[STAMP_STREAM][self.count] = stamp
+        for name in self.layout:
+            if name != STAMP_STREAM:
+                self.arrays[name][self.count] = frames[name]
+        self.count += 1
+
+    def close(self) -> None:
+        """Flush the frames and write the header."""
+        for array in self.arrays.values():
+            array.flush()
+        self.arrays = {}
+        self.write_header()
+
+
+class FrameStore:
+    """
+    Read-only random access to a frame store.
+
+    Streams are memory-mapped arrays of shape (count, *frame_shape), indexing
+    returns views into the file without copying.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Create FrameStore instance.
+
+        :param path: file of the store
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a frame store")
+        version, length = struct.unpack_from("<II", header, len(MAGIC))
+        if version != STORE_VERSION:
+            raise ValueError(f"Unsupported frame store version {version}")
+        start = len(MAGIC) + struct.calcsize("<II")
+        info = json.loads(header[start:start + length])
+        self.count = info["count"]
+        self.meta = info["meta"]
+        self.streams = {}
+        for name, s in info["streams"].items():
+            shape = (self.count, *s["shape"])
+            dtype = np.dtype(s["dtype"])
+            self.streams[name] = (
+                np.memmap(path, dtype=dtype, mode="r", offset=s["offset"],
+                          shape=shape)
+                if self.count else np.empty(shape, dtype=dtype))
+        self.stamps = self.streams[STAMP_STREAM]
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        names = [n for n in self.streams if n != STAMP_STREAM]
+        return f"FrameStore of {self.count} frames of {names} at {self.path}"
+
+    def __len__(self) -> int:
+        """Get number of frames."""
+        return self.count
+
+    def __contains__(self, stream: str) -> bool:
+        """Decide whether the store has a stream."""
+        return stream in self.streams
+
+    def __getitem__(self, i: int) -> Frame:
+        """
+        Get frame by index.
+
+        :param i: index of the frame
+        :return: Frame with views of the stored streams, missing are None
+        """
+        return Frame(float(self.stamps[i]), self.rgb(i),
+                     self.view("pc", i), self.view("depth", i))
+
+    def view(self, stream: str, i: int) -> np.ndarray:
+        """
+        Get one frame of a stream without copying.
+
+        :param stream: name of the stream
+        :param i: index of the frame
+        :return: read-only view, None if the store lacks the stream
+        """
+        if stream not in self.streams:
+            return None
+        return self.streams[stream][i]
+
+    def rgb(self, i: int) -> np.ndarray:
+        """
+        Get RGB image of a frame without copying.
+
+        :param i: index of the frame
+        :return: read-only view of the image
+        """
+        return self.streams["rgb"][i]
+
+
+def mat_stamp(data: dict, filename: str) -> tuple:
+    """
+    Get capture time of a .mat snapshot.
+
+    :param data: loaded snapshot
+    :param filename: file of the snapshot
+    :return: stamp and boolean, True when the stamp is only the file
+             modification time because the snapshot has none
+    """
+    if MAT_STAMP_KEY in data:
+        return float(np.ravel(data[MAT_STAMP_KEY])[0]), False
+    return os.path.getmtime(filename), True
+
+
+def convert_mat(filenames: list, path: str) -> FrameStore:
+    """
+    Convert .mat snapshots to a frame store, one snapshot in memory at a time.
+
+    Snapshots without a stamp get their file modification time instead and
+    the store is flagged by PLACEHOLDER_STAMPS in its meta.
+
+    :param filenames: .mat files written by record_data.py or example_photo
+    :param path: file of the store
+    :return: FrameStore of the written file
+    """
+    first = scipy.io.loadmat(filenames[0])
+    streams = {name: (first[key].shape, first[key].dtype)
+               for name, key in MAT_KEYS.items() if key in first}
+    meta = {k: first[k] for k in ("K_rgb", "K_depth") if k in first}
+    writer = FrameStoreWriter(path, len(filenames), streams, meta)
+    placeholder = False
+    for filename in filenames:
+        data = first if filename == filenames[0] else scipy.io.loadmat(
+            filename)
+        stamp, missing = mat_stamp(data, filename)
+        placeholder |= missing
+        writer.append(stamp,
+                      **{name: data[MAT_KEYS[name]] for name in streams})
+    writer.meta[PLACEHOLDER_STAMPS] = placeholder
+    writer.close()
+    return FrameStore(path)
+
+
+def convert_log(log_path: str, path: str) -> FrameStore:
+    """
+    Convert frames of a mission log to a frame store.
+
+    Every RGB image is stored with the depth image and point cloud closest
+    in time.
+
+    :param log_path: directory of the log written by recording.Recorder
+    :param path: file of the store
+    :return: FrameStore of the written file
+    """
+    log = LogReader(log_path)
+    names = [name for name in MAT_KEYS if log.count(name)]
+    samples = {name: log.read(name, 0) for name in names}
+    writer = FrameStoreWriter(
+        path, log.count("rgb"),
+        {name: (s.shape, s.dtype) for name, s in samples.items()},
+        {k: v for k, v in log.meta.items() if k in ("K_rgb", "K_depth")})
+    for i, stamp in enumerate(log.stamps.get("rgb", ())):
+        writer.append(stamp, **{
+            name: log.read(name, i if name == "rgb" else
+                           closest_index(log.stamps[name], stamp))
+            for name in names})
+    writer.close()
+    return FrameStore(path)
+
+
+def main() -> None:
+    """Convert .mat snapshots or a mission log given on the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("output", help=f"store, usually *{FRAME_STORE_SUFFIX}")
+    parser.add_argument("inputs", nargs="+",
+                        help=".mat files, directories of them or a log")
+    args = parser.parse_args()
+
+    if (len(args.inputs) == 1 and
+            os.path.isfile(os.path.join(args.inputs[0], "meta.json"))):
+        store = convert_log(args.inputs[0], args.output)
+    else:
+        filenames = []
+        for name in args.inputs:
+            filenames += (sorted(glob.glob(os.path.join(name, "*.mat")))
+                          if os.path.isdir(name) else [name])
+        if not filenames:
+            parser.error("no .mat files given")
+        store = convert_mat(filenames, args.output)
+    print(store)
+
+
+if __name__ == "__main__":
+    main()
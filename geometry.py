@@ -1,10 +1,14 @@
 """
 Geometry module with Point, Line and Segment.
 
+Array-backed counterparts PointArray, SegmentArray and CircleArray compute
+with many objects in one NumPy broadcast.
+
 Used primarily in mapping.py.
 """
 
 
+import math
 from typing import Union
 
 import numpy as np
@@ -17,16 +21,19 @@ def normalize_angle(angle: float) -> float:
     :param angle: angle to normalize
     :return: normalized angle
     """
-    return np.arctan2(np.sin(angle), np.cos(angle))
+    return math.atan2(math.sin(angle), math.cos(angle))
 
 
 class Point:
     """
     Vector representing a location of a certain point.
 
-    Implemented basic arithmetic operations.
+    Implemented basic arithmetic operations. Scalar operations use math,
+    sin and cos of the angle are cached until the angle changes.
     """
 
+    __slots__ = ("x", "y", "_angle", "_sin", "_cos")
+
     def __init__(self, x: float, y: float, angle: float = 0) -> None:
         """
         Create Point instance.
@@ -39,6 +46,25 @@ class Point:
         self.y = y
         self.angle = angle
 
+    @property
+    def angle(self) -> float:
+        """
+        Get rotation of the vector.
+
+        :return: angle
+        """
+        return self._angle
+
+    @angle.setter
+    def angle(self, angle: float) -> None:
+        """
+        Set rotation of the vector and invalidate cached sin and cos.
+
+        :param angle: new angle
+        """
+        self._angle = angle
+        self._sin = None
+
     def __repr__(self) -> str:
         """Return string representation of object."""
         return f"({self.x}, {self.y}, {self.angle})"
@@ -117,22 +143,26 @@ class Point:
         return np.array((self.x, self.y))
 
     @property
-    def sin(self) -> np.ndarray:
+    def sin(self) -> float:
         """
         Get sin of the point angle.
 
         :return: sin of angle
         """
-        return np.sin(self.angle)
+        if self._sin is None:
+            self._sin, self._cos = math.sin(self._angle), math.cos(self._angle)
+        return self._sin
 
     @property
-    def cos(self) -> np.ndarray:
+    def cos(self) -> float:
         """
         Get cos of the point angle.
 
         :return: cos of angle
         """
-        return np.cos(self.angle)
+        if self._sin is None:
+            self._sin, self._cos = math.sin(self._angle), math.cos(self._angle)
+        return self._cos
 
     @property
     def homog_xy(self) -> np.ndarray:
@@ -158,16 +188,16 @@ class Point:
         :param point: target point
         :return: distance from the point
         """
-        return np.sqrt(np.sum(np.power(self.xy - point.xy, 2)))
+        return math.hypot(self.x - point.x, self.y - point.y)
 
-    def relative_angle(self, point: 'Point') -> np.ndarray:
+    def relative_angle(self, point: 'Point') -> float:
         """
         Compute angle of connecting line.
 
         :param point: reference point
         :return: angle in the range (-π, π]
         """
-        return np.arctan2(point.y - self.y, point.x - self.x)
+        return math.atan2(point.y - self.y, point.x - self.x)
 
 
 class Line:
@@ -320,6 +350,251 @@ def intersection(circle: Circle, linear: Union[Line, Segment]) -> list:
         return intersects
 
 
+class PointView(Point):
+    """Point whose x and y are a view of a row of a PointArray."""
+
+    __slots__ = ("_row",)
+
+    def __init__(self, row: np.ndarray, angle: float = 0) -> None:
+        """
+        Create PointView instance.
+
+        :param row: coordinates, view of shape (2,)
+        :param angle: rotation of the vector, not stored in the array
+        """
+        self._row = row
+        self.angle = angle
+
+    @property
+    def x(self) -> float:
+        """
+        Get x position from the array.
+
+        :return: x position
+        """
+        return float(self._row[0])
+
+    @x.setter
+    def x(self, x: float) -> None:
+        """
+        Set x position in the array.
+
+        :param x: new x position
+        """
+        self._row[0] = x
+
+    @property
+    def y(self) -> float:
+        """
+        Get y position from the array.
+
+        :return: y position
+        """
+        return float(self._row[1])
+
+    @y.setter
+    def y(self, y: float) -> None:
+        """
+        Set y position in the array.
+
+        :param y: new y position
+        """
+        self._row[1] = y
+
+
+class PointArray:
+    """Array of points, item i is a PointView of row i."""
+
+    def __init__(self, xy: np.ndarray) -> None:
+        """
+        Create PointArray instance.
+
+        :param xy: coordinates, shape (n, 2)
+        """
+        self.xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+
+    @classmethod
+    def from_points(cls, points: list) -> 'PointArray':
+        """
+        Create PointArray from a list of Points.
+
+        :param points: list of Points
+        :return: PointArray
+        """
+        return cls([(p.x, p.y) for p in points])
+
+    def __len__(self) -> int:
+        """Return number of points."""
+        return len(self.xy)
+
+    def __getitem__(self, i: int) -> PointView:
+        """Return point i as PointView, setting x or y writes the array."""
+        return PointView(self.xy[i])
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"PointArray of {len(self)} points"
+
+    def distance(self, points: 'PointArray') -> np.ndarray:
+        """
+        Calculate distances of all pairs of points.
+
+        :param points: second PointArray
+        :return: distances, shape (len(self), len(points))
+        """
+        diff = self.xy[:, None, :] - points.xy[None, :, :]
+        return np.hypot(diff[..., 0], diff[..., 1])
+
+
+class SegmentArray:
+    """Array of segments from a[i] to b[i], item i is a Segment view."""
+
+    def __init__(self, a: PointArray, b: PointArray) -> None:
+        """
+        Create SegmentArray instance.
+
+        :param a: first points
+        :param b: second points
+        """
+        self.a, self.b = a, b
+
+    @classmethod
+    def from_route(cls, route: list) -> 'SegmentArray':
+        """
+        Create segments connecting consecutive points of a route.
+
+        :param route: list of Points
+        :return: SegmentArray
+        """
+        points = PointArray.from_points(route)
+        return cls(PointArray(points.xy[:-1]), PointArray(points.xy[1:]))
+
+    def __len__(self) -> int:
+        """Return number of segments."""
+        return len(self.a)
+
+    def __getitem__(self, i: int) -> Segment:
+        """Return segment i as Segment."""
+        return Segment(self.a[i], self.b[i])
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"SegmentArray of {len(self)} segments"
+
+    @property
+    def direction_vector(self) -> np.ndarray:
+        """
+        Vectors get with b - a.
+
+        :return: direction vectors, shape (n, 2)
+        """
+        return self.b.xy - self.a.xy
+
+    def closest(self, points: PointArray) -> np.ndarray:
+        """
+        Find the closest point of each segment to each point.
+
+        :param points: reference points
+        :return: closest points, shape (len(self), len(points), 2)
+        """
+        d = self.direction_vector
+        length_sq = np.sum(np.square(d), axis=1)
+        rel = points.xy[None, :, :] - self.a.xy[:, None, :]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.sum(rel * d[:, None, :], axis=2) / length_sq[:, None]
+        t = np.clip(np.nan_to_num(t), 0, 1)
+        return self.a.xy[:, None, :] + t[..., None] * d[:, None, :]
+
+    def distance(self, points: PointArray) -> np.ndarray:
+        """
+        Calculate distances of all segments to all points.
+
+        :param points: reference points
+        :return: distances, shape (len(self), len(points))
+        """
+        diff = self.closest(points) - points.xy[None, :, :]
+        return np.hypot(diff[..., 0], diff[..., 1])
+
+
+class CircleArray:
+    """Array of circles with centers c[i] and radii r[i]."""
+
+    def __init__(self, c: PointArray, r: np.ndarray) -> None:
+        """
+        Create CircleArray instance.
+
+        :param c: centers
+        :param r: radii, shape (n,)
+        """
+        self.c = c
+        self.r = np.asarray(r, dtype=float).reshape(-1)
+
+    @classmethod
+    def from_circles(cls, circles: list) -> 'CircleArray':
+        """
+        Create CircleArray from a list of Circles.
+
+        :param circles: list of Circles
+        :return: CircleArray
+        """
+        return cls(PointArray.from_points([z.c for z in circles]),
+                   [z.r for z in circles])
+
+    def __len__(self) -> int:
+        """Return number of circles."""
+        return len(self.r)
+
+    def __getitem__(self, i: int) -> Circle:
+        """Return circle i as Circle."""
+        return Circle(self.c[i], float(self.r[i]))
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"CircleArray of {len(self)} circles"
+
+    def is_inner(self, points: PointArray) -> np.ndarray:
+        """
+        Decide which points lie in the inner part of which circle.
+
+        :param points: reference points
+        :return: booleans, shape (len(self), len(points))
+        """
+        return self.c.distance(points) <= self.r[:, None]
+
+    def crosses(self, segments: SegmentArray) -> np.ndarray:
+        """
+        Decide which segments enter the inner part of which circle.
+
+        :param segments: reference segments
+        :return: booleans, shape (len(segments), len(self))
+        """
+        return segments.distance(self.c) < self.r[None, :]
+
+
+def batch_intersection(circles: CircleArray,
+                       segments: SegmentArray) -> tuple:
+    """
+    Calculate intersects of all segments with all circles at once.
+
+    :param circles: reference circles
+    :param segments: reference segments
+    :return: intersects of shape (len(segments), len(circles), 2, 2) and
+        boolean mask of valid intersects of shape (..., 2)
+    """
+    d = segments.direction_vector[:, None, :]
+    f = segments.a.xy[:, None, :] - circles.c.xy[None, :, :]
+    a = np.sum(np.square(d), axis=2)
+    b = 2 * np.sum(f * d, axis=2)
+    c = np.sum(np.square(f), axis=2) - np.square(circles.r)[None, :]
+    delta = np.square(b) - 4 * a * c
+    with np.errstate(invalid="ignore", divide="ignore"):
+        root = np.sqrt(delta)
+        t = np.stack(((-b - root) / (2 * a), (-b + root) / (2 * a)), axis=2)
+    valid = (delta >= 0)[..., None] & (a > 0)[..., None] & (t >= 0) & (t <= 1)
+    points = segments.a.xy[:, None, None, :] + t[..., None] * d[:, :, None, :]
+    return points, valid
+
+
 if __name__ == "__main__":
     print(intersection(Circle(Point(0, 1), 5),
                        Segment(Point(6, 4), Point(-2, 4))))
@@ -1,64 +1,87 @@
 """All implemented features for completion challenge no. 2."""
 
 
+import atexit
 import sys
+import time
 
-from robolab_turtlebot import Rate, Turtlebot, sleep
 from mapping import Map
+from planning import PlannerMode
 from robot import Robot
+from timing import report
+from constants import CONTROL_RATE
 
 
-if len(sys.argv) > 1:
+# --record=DIR logs all sensor data, see recording.py, --record-pc adds
+# point clouds to the log
+RECORD = next((a.split("=", 1)[1] for a in sys.argv[1:]
+               if a.startswith("--record=")), None)
+RECORD_PC = "--record-pc" in sys.argv[1:]
+if len([a for a in sys.argv[1:]
+        if not a.startswith("--record")]) > 0:
     DEBUG = True
 else:
     DEBUG = False
 
 
-if __name__ == "__main__":
-    turtle_ = Turtlebot(rgb=True, depth=True, pc=True)
+def main(turtle: any, rate: any, sleep: any, clock: any = time.monotonic,
+         acquisition: bool = True, debug: bool = False) -> Robot:
+    """
+    Run the whole mission: find the ball and the goal and score.
+
+    :param turtle: turtle instance (Turtlebot or simulation.SimTurtle)
+    :param rate: rate instance of the control loops
+    :param sleep: sleep function
+    :param clock: function returning current time, the time base of rate
+    :param acquisition: boolean for background acquisition of images
+    :param debug: boolean for debug
+    :return: Robot after the mission
+    """
     sleep(2)
-    turtle_.play_sound(1)
+    turtle.play_sound(1)
     sleep(0.3)
-    rate = Rate(50)
-    robot = Robot(turtle_, rate)
+    robot = Robot(turtle, rate, clock=clock)
+    if debug:
+        # also printed when the bumper stops the program
+        atexit.register(lambda: print(report(robot.loop_stats())))
     robot.reset()
-    robot_map = Map()
+    if acquisition:
+        robot.start_acquisition()
+    robot_map = Map(planner_mode=PlannerMode.VISIBILITY)
 
     # base distance for calculating kick position
-    KICK_DISTANCE = 1
+    kick_distance = 1
 
     print("Wait for button press on robot...")
     while not robot.button:
-        pass
+        sleep(0.01)
 
     # find ball and poles and add them to the map
-    robot.scan_environment(robot_map, debug_info=DEBUG)
+    robot.scan_environment(robot_map, debug_info=debug)
 
-    ball = robot_map.ball
-    kick_pos = robot_map.determine_kick_pos(dist=KICK_DISTANCE)
+    kick_pos = robot_map.determine_kick_pos(dist=kick_distance)
     path = robot_map.routing(robot.position, kick_pos)
 
-    if DEBUG:
+    if debug:
         robot_map.show(show_all=False, show_merged=True, path=path,
                        danger_zones=robot_map.danger_zones,
                        robot_pos=robot.position,
                        kick_pos=kick_pos, debug_info=True)
 
     # go in front of ball
-    for p in path[1:]:
-        robot.go_to(p)
+    robot.follow_path(path, debug_info=debug)
 
     while True:
         # reset all systems and scan the environment for second time
         robot_map.reset()
         robot.reset()
-        first_try = robot.scan_environment(robot_map, debug_info=DEBUG)
+        first_try = robot.scan_environment(robot_map, debug_info=debug)
         # calculate position for kick and to it
         if first_try:
-            KICK_DISTANCE = 0.6
+            kick_distance = 0.6
         kick_pos = robot_map.determine_kick_pos(dist=0.6)
         robot.go_to(kick_pos)
-        if KICK_DISTANCE == 0.6:
+        if kick_distance == 0.6:
             break
 
     print("INIT KICK MODE")
@@ -68,3 +91,17 @@ if __name__ == "__main__":
 
     # kick the ball to the goal
     robot.kick(0.5, speed=1.5)
+    robot.stop_acquisition()
+    return robot
+
+
+if __name__ == "__main__":
+    from robolab_turtlebot import Rate, Turtlebot, sleep as turtle_sleep
+    turtle_ = Turtlebot(rgb=True, depth=True, pc=True)
+    if RECORD:
+        from recording import Recorder, RecordingTurtle
+        turtle_ = RecordingTurtle(turtle_, Recorder(RECORD),
+                                  point_cloud=RECORD_PC)
+        # also closed when the bumper stops the program
+        atexit.register(turtle_.close)
+    main(turtle_, Rate(CONTROL_RATE), turtle_sleep, debug=DEBUG)
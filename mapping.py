@@ -1,24 +1,33 @@
 """Module to keep, process and plan navigational data during a move."""
 
 
+import time
+
 import matplotlib.patches as patches
 import matplotlib.pyplot as plt
 import numpy as np
-from geometry import Circle, Line, Point, Segment, intersection
+from clustering import BACKENDS, ClusterMode
+from distance_field import FIELD_RESOLUTION, DistanceField
+from geometry import (Circle, CircleArray, Line, Point, PointArray,
+                      Segment, SegmentArray, batch_intersection,
+                      intersection)
+from observations import COLORS, ObservationStore
+from planning import PlannerMode, visibility_route
 from rigidobject import RigidObject, RigidType
 from constants import MAX_OBJECTS, MIN_MATCHES, DISCRETE_INCREMENT
 from utils import ProcessError
 
 
-def average(object_a: RigidObject, object_b: RigidObject) -> Point:
+def transform_matrix(base_pos: Point) -> np.ndarray:
     """
-    Get an averagely estimated RigidObject from among two RigidObjects.
+    Homogeneous matrix transforming vectors from the base_pos system.
 
-    :param object_a: first reference RigidObject
-    :param object_b: second reference RigidObject
-    :return: RigidObject estimate
+    :param base_pos: default system
+    :return: 3x3 matrix
     """
-    return Point(*np.mean([object_a.xy, object_b.xy], axis=0))
+    return np.array([[base_pos.cos, -base_pos.sin, base_pos.x],
+                     [base_pos.sin, base_pos.cos, base_pos.y],
+                     [0, 0, 1]])
 
 
 def transform(position: Point,
@@ -35,10 +44,7 @@ def transform(position: Point,
     if debug_info:
         print("Position before rot.", position)
         print("Robot position: ", base_pos)
-    transform_matrix = np.array([[base_pos.cos, -base_pos.sin, base_pos.x],
-                                [base_pos.sin, base_pos.cos, base_pos.y],
-                                [0, 0, 1]])
-    result = np.dot(transform_matrix, position.homog_xy)[:2]
+    result = np.dot(transform_matrix(base_pos), position.homog_xy)[:2]
     if debug_info:
         print("After rotation")
     return Point(*result)
@@ -70,10 +76,55 @@ def has_all(all_objects: list) -> bool:
 class Map:
     """Object for keeping known objects and processing them."""
 
-    def __init__(self, threshold: float = 0.2) -> None:
-        """Set up a Map instance."""
-        self.objects = []
+    def __init__(self, threshold: float = 0.2,
+                 cluster_mode: ClusterMode = ClusterMode.GRID,
+                 planner_mode: PlannerMode = PlannerMode.DETOUR,
+                 field_resolution: float = FIELD_RESOLUTION) -> None:
+        """
+        Set up a Map instance.
+
+        :param threshold: maximal distance of merged objects
+        :param cluster_mode: clustering backend, GREEDY is the reference
+        :param planner_mode: route planner used by routing
+        :param field_resolution: cell size of danger_field in meters
+        """
+        self.store = ObservationStore()
+        self.poses = []
         self.threshold = threshold
+        self.cluster_mode = cluster_mode
+        self.planner_mode = planner_mode
+        self.field_resolution = field_resolution
+        # merged objects are kept up to date by add_object
+        self.clusters = self.new_clusters()
+        # version is increased on every change and invalidates cached views
+        self.version = 0
+        self.views = {}
+        self.views_version = 0
+
+    def cached(self, name: str, compute: callable) -> any:
+        """
+        Get derived view of merged objects, compute it only after a change.
+
+        :param name: name of the view
+        :param compute: function computing the view
+        :return: the view
+        """
+        if self.views_version != self.version:
+            self.views = {}
+            self.views_version = self.version
+        if name not in self.views:
+            self.views[name] = compute()
+        return self.views[name]
+
+    @property
+    def objects(self) -> list:
+        """
+        Get all known objects before merging.
+
+        :return: list of RigidObject views of the observation store, created
+                 once per change
+        """
+        return self.cached("objects", self.store.views)
 
     @property
     def poles(self, debug_info: bool = False) -> list:
@@ -110,6 +161,24 @@ class Map:
         """
         Zones that the center of robot should not cross to prevent collisions.
 
+        :return: list of danger zones
+        """
+        return self.cached("danger_zones", self.compute_danger_zones)
+
+    @property
+    def danger_field(self) -> DistanceField:
+        """
+        Signed distance raster of danger zones, rebuilt only after a change.
+
+        :return: DistanceField of danger_zones
+        """
+        return self.cached("danger_field", lambda: DistanceField(
+            self.danger_zones, self.field_resolution))
+
+    def compute_danger_zones(self) -> list:
+        """
+        Create danger zones around all merged objects.
+
         :return: list of danger zones
         """
         obj_dict, _ = self.merge_objects()
@@ -129,12 +198,22 @@ class Map:
 
         :return: boolean
         """
-        obj_dict, counter = self.merge_objects()
-        correct = dict.fromkeys(obj_dict, 0)
-        for key in obj_dict:
-            for i, _ in enumerate(obj_dict[key]):
-                if counter[key][i] >= MIN_MATCHES:
-                    correct[key] += 1
+        return self.cached("has_all", self.compute_has_all)
+
+    def compute_has_all(self) -> bool:
+        """
+        Count merged objects seen at least MIN_MATCHES times.
+
+        A merged object is confirmed by the observations of its type closer
+        than threshold, found by one masked query of the store.
+
+        :return: boolean, see has_all
+        """
+        obj_dict, _ = self.merge_objects()
+        correct = {o_type: sum(
+            len(self.store.within(obj.position, self.threshold, o_type)) >=
+            MIN_MATCHES for obj in merged)
+            for o_type, merged in obj_dict.items()}
         if (correct[RigidType.POLE] >= MAX_OBJECTS[RigidType.POLE] and
                 correct[RigidType.BALL] >= MAX_OBJECTS[RigidType.BALL]):
             return True
@@ -143,16 +222,42 @@ class Map:
 
     def reset(self) -> None:
         """Set all known object to blank list."""
-        self.objects = []
+        self.store.clear()
+        self.poses = []
+        self.clusters = self.new_clusters()
+        self.version += 1
+
+    def new_clusters(self) -> dict:
+        """
+        Create empty clustering backend for each object type.
+
+        :return: dict of backends
+        """
+        backend = BACKENDS[self.cluster_mode]
+        return {o_type: backend(self.threshold) for o_type in RigidType}
+
+    def pose_id(self, robot_pos: Point) -> int:
+        """
+        Get index of robot position, remember it when it is a new one.
+
+        :param robot_pos: robot position
+        :return: index into poses
+        """
+        if not self.poses or not np.array_equal(self.poses[-1].xya,
+                                                robot_pos.xya):
+            self.poses.append(Point(*robot_pos.xya))
+        return len(self.poses) - 1
 
     def add_object(self, object_a: RigidObject,
-                   robot_pos: Point, debug_info: bool = False) -> None:
+                   robot_pos: Point, debug_info: bool = False,
+                   stamp: float = None) -> None:
         """
         Introduce a new object to all known objects.
 
         :param object_a: the new object
         :param robot_pos: robot position
         :param debug_info: boolean for debug
+        :param stamp: observation time, now by default
         """
         if debug_info:
             print("BEFORE ROTATION:", object_a.position)
@@ -160,7 +265,54 @@ class Map:
                                         robot_pos, debug_info))
         if debug_info:
             print("AFTER ROTATION:", object_a.position)
-        self.objects.append(object_a)
+        self.store.append(object_a,
+                          time.monotonic() if stamp is None else stamp,
+                          self.pose_id(robot_pos))
+        self.merge_object(object_a)
+        self.version += 1
+
+    def add_objects(self, objects: list, robot_pos: Point,
+                    debug_info: bool = False, stamp: float = None) -> None:
+        """
+        Introduce all objects seen from one robot position at once.
+
+        The transform is built once and applied to all objects in a single
+        matrix multiplication.
+
+        :param objects: list of new objects
+        :param robot_pos: robot position
+        :param debug_info: boolean for debug
+        :param stamp: observation time, now by default
+        """
+        if not objects:
+            return
+        homog = np.ones((len(objects), 3))
+        homog[:, :2] = [(o.p.x, o.p.y) for o in objects]
+        xy = homog @ transform_matrix(robot_pos).T[:, :2]
+        if debug_info:
+            print("Robot position: ", robot_pos)
+            print("BEFORE ROTATION:", homog[:, :2])
+            print("AFTER ROTATION:", xy)
+        rows = self.store.extend(objects, xy,
+                                 time.monotonic() if stamp is None else stamp,
+                                 self.pose_id(robot_pos))
+        for obj, (x, y) in zip(objects, xy):
+            obj.set_position(Point(float(x), float(y)))
+        # clusters of each type get the new objects in the order they came
+        for o_type in RigidType:
+            for i in rows[self.store.mask(o_type)[rows]]:
+                self.clusters[o_type].add(objects[i - rows[0]])
+        self.version += 1
+
+    def merge_object(self, object_a: RigidObject) -> None:
+        """
+        Merge a new object into all merged objects closer than threshold.
+
+        The new object starts its own merged object when none is close.
+
+        :param object_a: the new object
+        """
+        self.clusters[object_a.o_type].add(object_a)
 
     @staticmethod
     def is_max_reached(o_type: RigidType, count: dict) -> bool:
@@ -214,9 +366,13 @@ class Map:
                     type_counter[object_type] += 1
 
         if show_all:
-            for point in self.objects:
-                pos = point.xy
-                ax.scatter(*pos, color=point.color, s=25, alpha=0.2)
+            colors = np.array([c.value for c in COLORS])
+            ax.scatter(*self.store.xy.T, s=25, alpha=0.2,
+                       color=colors[self.store.column("c_type")])
+            # robot poses the objects were observed from
+            seen = [self.poses[i].xy
+                    for i in np.unique(self.store.column("pose_id")) if i >= 0]
+            ax.scatter(*np.reshape(seen, (-1, 2)).T, color="gray", marker="x")
         if robot_pos is not None:
             x_end = robot_pos.x + 0.2 * robot_pos.cos
             y_end = robot_pos.y + 0.2 * robot_pos.sin
@@ -263,42 +419,27 @@ class Map:
         :param debug_info: boolean for debug
         :return: most probable objects and their amounts of sources
         """
+        objects, merge_count = self.cached("merged", self.sort_merged)
+        if debug_info:
+            print(merge_count)
+        return objects, merge_count
+
+    def sort_merged(self) -> tuple:
+        """
+        Sort merged objects of each type by merge counter.
+
+        :return: sorted merged objects and their amounts of sources
+        """
         objects = {}
         merge_count = {}
         for o_type in RigidType:
-            unmerged = list(filter(lambda x: x.o_type == o_type, self.objects))
-            merged = []
-            merged_counter = []
-
-            for pole in unmerged:
-                # add pole when empty
-                if not merged:
-                    merged.append(pole)
-                    merged_counter.append(1)
-                    continue
-
-                dists = [pole.position.distance(x) for x in merged]
-                is_merged = False
-                for k, x in enumerate(dists):
-                    # merge into existing object
-                    if x < self.threshold:
-                        merged[k].set_position(average(merged[k], pole))
-                        merged_counter[k] += 1
-                        is_merged = True
-
-                if is_merged:
-                    continue
-                else:
-                    merged.append(pole)
-                    merged_counter.append(1)
-
+            merged = self.clusters[o_type].objects
+            merged_counter = list(self.clusters[o_type].counter)
             sorted_objects = [obj for _,
                               obj in sorted(zip(merged_counter, merged),
                                             key=lambda x: x[0], reverse=True)]
             objects[o_type] = sorted_objects
             merge_count[o_type] = merged_counter
-        if debug_info:
-            print(merge_count)
         return objects, merge_count
 
     def determine_kick_pos(self, dist: float = 1) -> Point:
@@ -333,58 +474,103 @@ class Map:
         :param f_pos: finish position
         :return: list of positions along the route
         """
+        if self.planner_mode == PlannerMode.VISIBILITY:
+            return self.orient_route(
+                visibility_route(s_pos, f_pos, self.danger_zones))
+
         route = [s_pos, f_pos]
         dz = self.danger_zones
-        if any(zone.is_inner(f_pos) for zone in dz):
+        field = self.danger_field
+        ball = self.ball[0].position if self.ball else None
+        if field.is_inner(f_pos):
             return []
+        if field.route_clear(route):
+            return self.orient_route(route)
+        circles = CircleArray.from_circles(dz)
         change = True
         change_counter = 0
         while change and change_counter < 10:
             change = False
             for i in range(len(route) - 1):
-                line = Line(route[i], route[i + 1])
-                seg = Segment(route[i], route[i + 1])
-                for zone in sorted(dz, key=lambda z: z.c.distance(route[i])):
-                    intersects = intersection(zone, line)
-                    if (not intersects or intersects[0] == intersects[1] or
-                            not (seg.is_element_of(intersects[0]) or
-                                 seg.is_element_of(intersects[1]))):
-                        continue
-                    chord_seg = Segment(*intersects)
+                crossed = self.crossed_zone(circles, route[i], route[i + 1])
+                if crossed is not None:
+                    k, chord_seg = crossed
+                    zone = dz[k]
                     diameter_line = Line(chord_seg.midpoint, zone.c)
                     new_stop_candidates = intersection(
                         Circle(zone.c, 2 * zone.r -
                                zone.c.distance(chord_seg.midpoint)),
                         diameter_line
                     )
-                    if np.isclose(*(p.distance(self.ball[0]) for p in
-                                    new_stop_candidates)):
-                        new_stop = min(new_stop_candidates,
-                                       key=lambda p: p.distance(route[i]))
-                    else:
-                        new_stop = max(new_stop_candidates,
-                                       key=lambda p: p.distance(self.ball[0]))
-
+                    new_stop = self.detour_stop(new_stop_candidates,
+                                                route[i], ball)
 
-                    while any(z.is_inner(new_stop) for z in dz):
+                    while field.is_inner(new_stop):
                         new_stop_candidates = intersection(
                             Circle(zone.c, zone.c.distance(new_stop) +
                                    DISCRETE_INCREMENT),
                             Line(new_stop, zone.c)
                         )
-                        if np.isclose(*(p.distance(self.ball[0]) for p in
-                                        new_stop_candidates)):
-                            new_stop = min(new_stop_candidates,
-                                           key=lambda p: p.distance(route[i]))
-                        else:
-                            new_stop = max(new_stop_candidates,
-                                           key=lambda p: p.distance(
-                                               self.ball[0]))
+                        new_stop = self.detour_stop(new_stop_candidates,
+                                                    route[i], ball)
 
                     route.insert(i + 1, new_stop)
                     change = True
                     change_counter += 1
-                    break
+        return self.orient_route(route)
+
+    @staticmethod
+    def crossed_zone(circles: CircleArray, a: Point, b: Point) -> tuple:
+        """
+        Find the danger zone closest to a whose boundary the segment crosses.
+
+        All zones are intersected with the segment from a to b at once.
+
+        :param circles: danger zones
+        :param a: start of the segment
+        :param b: end of the segment
+        :return: index of the zone and its chord on the line through a and
+                 b, None if no zone is crossed
+        """
+        points, valid = batch_intersection(
+            circles, SegmentArray.from_route([a, b]))
+        points, valid = points[0], valid[0]
+        # tangent segments only touch the zone and are not detoured
+        crossing = (np.any(valid, axis=1) &
+                    np.any(points[:, 0] != points[:, 1], axis=1))
+        if not np.any(crossing):
+            return None
+        distance = circles.c.distance(PointArray.from_points([a]))[:, 0]
+        k = int(np.argmin(np.where(crossing, distance, np.inf)))
+        return k, Segment(*(Point(*(float(v) for v in p))
+                            for p in points[k]))
+
+    @staticmethod
+    def detour_stop(candidates: list, origin: Point, ball: Point) -> Point:
+        """
+        Choose a new stop of a detour around a danger zone.
+
+        The stop farther from the ball is preferred. Without a ball, or when
+        both are equally far from it, the stop closer to origin is taken.
+
+        :param candidates: two possible stops on both sides of the zone
+        :param origin: start of the detoured segment
+        :param ball: position of the ball, None if no ball is known
+        :return: the chosen stop
+        """
+        if ball is None or np.isclose(*(p.distance(ball)
+                                        for p in candidates)):
+            return min(candidates, key=lambda p: p.distance(origin))
+        return max(candidates, key=lambda p: p.distance(ball))
+
+    @staticmethod
+    def orient_route(route: list) -> list:
+        """
+        Turn inner positions of the route towards the next position.
+
+        :param route: list of positions along the route
+        :return: the same route
+        """
         for point_index in range(1, len(route) - 1):
             vector = np.append(Line(route[point_index], route[point_index + 1])
                                .direction_vector.xy, 0)
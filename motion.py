@@ -0,0 +1,105 @@
+"""Velocity profiles of point-to-point moves used in robot.py."""
+
+
+import math
+from enum import Enum
+
+
+class ProfileShape(Enum):
+    """Enum of shapes of acceleration and deceleration phases."""
+
+    TRAPEZOID = 1
+    S_CURVE = 2
+
+
+# peak acceleration of the ramp relative to the constant one of a trapezoid
+RAMP_PEAK = {ProfileShape.TRAPEZOID: 1.0, ProfileShape.S_CURVE: 1.5}
+
+
+class MotionProfile:
+    """
+    Velocity profile of a move starting and ending at rest.
+
+    The move has accelerate, cruise and decelerate phases. Trapezoid ramps
+    have constant acceleration. S-curve ramps follow the smoothstep
+    3u^2 - 2u^3, so the acceleration starts and ends at zero and peaks at
+    max_acceleration in the middle of the ramp. Short moves never reach
+    max_velocity and have no cruise phase.
+    """
+
+    def __init__(self, distance: float, max_velocity: float,
+                 max_acceleration: float,
+                 shape: ProfileShape = ProfileShape.TRAPEZOID) -> None:
+        """
+        Create MotionProfile instance.
+
+        :param distance: length of the move, non-negative
+        :param max_velocity: cruise velocity
+        :param max_acceleration: maximal acceleration
+        :param shape: shape of the ramps
+        """
+        self.distance = distance
+        self.shape = shape
+        # mean acceleration of a ramp
+        acceleration = max_acceleration / RAMP_PEAK[shape]
+        self.peak = min(max_velocity, math.sqrt(distance * acceleration))
+        self.t_ramp = self.peak / acceleration if self.peak > 0 else 0.0
+        self.d_ramp = self.peak * self.t_ramp / 2
+        self.t_cruise = ((distance - 2 * self.d_ramp) / self.peak
+                         if self.peak > 0 else 0.0)
+        self.duration = 2 * self.t_ramp + self.t_cruise
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return (f"{self.shape.name} profile of {self.distance:.3f} "
+                f"in {self.duration:.2f} s, peak {self.peak:.2f}")
+
+    def ramp(self, t: float) -> tuple:
+        """
+        Get state of the acceleration phase.
+
+        :param t: time since start of the ramp, 0 <= t <= t_ramp
+        :return: travelled distance and velocity
+        """
+        u = t / self.t_ramp
+        if self.shape == ProfileShape.S_CURVE:
+            return (self.peak * self.t_ramp * (u ** 3 - u ** 4 / 2),
+                    self.peak * (3 * u ** 2 - 2 * u ** 3))
+        return self.peak * t * u / 2, self.peak * u
+
+    def state(self, t: float) -> tuple:
+        """
+        Get reference state of the move.
+
+        :param t: time since start of the move
+        :return: travelled distance and velocity
+        """
+        if t <= 0 or self.peak <= 0:
+            return 0.0, 0.0
+        if t >= self.duration:
+            return self.distance, 0.0
+        if t < self.t_ramp:
+            return self.ramp(t)
+        if t < self.t_ramp + self.t_cruise:
+            return self.d_ramp + self.peak * (t - self.t_ramp), self.peak
+        position, velocity = self.ramp(self.duration - t)
+        return self.distance - position, velocity
+
+
+def tracking_velocity(feedforward: float, correction: float,
+                      min_velocity: float, max_velocity: float,
+                      settling: bool) -> float:
+    """
+    Combine velocity of a profile with a regulator correction.
+
+    :param feedforward: reference velocity of the profile
+    :param correction: output of the regulator tracking the reference
+    :param min_velocity: smallest velocity moving the robot at all
+    :param max_velocity: velocity limit
+    :param settling: boolean, the profile has ended but the goal is not hit
+    :return: velocity command, negative when the robot has overshot
+    """
+    speed = feedforward + correction
+    if settling:
+        speed = math.copysign(max(abs(speed), min_velocity), speed)
+    return min(max(speed, -max_velocity), max_velocity)
@@ -0,0 +1,195 @@
+"""Compact array-backed store of observed objects used by mapping.py."""
+
+
+import numpy as np
+from geometry import Point
+from rigidobject import ColorType, RigidObject, RigidType
+
+
+COLORS = list(ColorType)
+
+# name, dtype and shape of one row of every column
+FIELDS = (
+    ("xy", np.float64, (2,)),
+    ("o_type", np.int8, ()),
+    ("c_type", np.int8, ()),
+    ("im_xy", np.int32, (2,)),
+    ("wh", np.int32, (2,)),
+    ("stamp", np.float64, ()),
+    ("pose_id", np.int32, ()),
+)
+
+
+class ObservationStore:
+    """
+    Struct-of-arrays store of observations.
+
+    Every field is kept in its own NumPy array which grows by doubling, so
+    filtering by type and geometric queries are vectorized masks. RigidObject
+    views are created only on demand.
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        """
+        Create ObservationStore instance.
+
+        :param capacity: initial number of rows
+        """
+        self.size = 0
+        self.data = {name: np.zeros((capacity,) + shape, dtype=dtype)
+                     for name, dtype, shape in FIELDS}
+
+    def __len__(self) -> int:
+        """Return number of observations."""
+        return self.size
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"ObservationStore of {self.size} observations"
+
+    @property
+    def capacity(self) -> int:
+        """
+        Get number of allocated rows.
+
+        :return: capacity
+        """
+        return len(self.data["stamp"])
+
+    def column(self, name: str) -> np.ndarray:
+        """
+        Get filled part of a column, no copy is made.
+
+        :param name: name of the field
+        :return: view of the column
+        """
+        return self.data[name][:self.size]
+
+    @property
+    def xy(self) -> np.ndarray:
+        """
+        Get real-world coordinates of all observations.
+
+        :return: view of shape (n, 2)
+        """
+        return self.column("xy")
+
+    def reserve(self, count: int) -> None:
+        """
+        Make sure there is space for count more observations.
+
+        :param count: number of rows to be appended
+        """
+        needed = self.size + count
+        if needed <= self.capacity:
+            return
+        capacity = max(self.capacity, 1)
+        while capacity < needed:
+            capacity *= 2
+        for name, column in self.data.items():
+            grown = np.zeros((capacity,) + column.shape[1:],
+                             dtype=column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.data[name] = grown
+
+    def append(self, obj: RigidObject, stamp: float = np.nan,
+               pose_id: int = -1) -> int:
+        """
+        Add one observation.
+
+        :param obj: observed object
+        :param stamp: observation time
+        :param pose_id: index of the robot pose of the observation
+        :return: index of the observation
+        """
+        self.reserve(1)
+        i = self.size
+        self.data["xy"][i] = (obj.p.x, obj.p.y)
+        self.data["o_type"][i] = obj.o_type.value
+        self.data["c_type"][i] = COLORS.index(obj.c_type)
+        self.data["im_xy"][i] = (obj.im_p.x, obj.im_p.y)
+        self.data["wh"][i] = (obj.w, obj.h)
+        self.data["stamp"][i] = stamp
+        self.data["pose_id"][i] = pose_id
+        self.size += 1
+        return i
+
+    def extend(self, objects: list, xy: np.ndarray, stamp: float = np.nan,
+               pose_id: int = -1) -> np.ndarray:
+        """
+        Add observations made at the same time from the same pose.
+
+        :param objects: observed objects
+        :param xy: real-world coordinates of objects, shape (n, 2)
+        :param stamp: observation time
+        :param pose_id: index of the robot pose of the observations
+        :return: indices of the observations
+        """
+        count = len(objects)
+        self.reserve(count)
+        rows = slice(self.size, self.size + count)
+        self.data["xy"][rows] = xy
+        self.data["o_type"][rows] = [o.o_type.value for o in objects]
+        self.data["c_type"][rows] = [COLORS.index(o.c_type) for o in objects]
+        self.data["im_xy"][rows] = [(o.im_p.x, o.im_p.y) for o in objects]
+        self.data["wh"][rows] = [(o.w, o.h) for o in objects]
+        self.data["stamp"][rows] = stamp
+        self.data["pose_id"][rows] = pose_id
+        self.size += count
+        return np.arange(rows.start, rows.stop)
+
+    def clear(self) -> None:
+        """Forget all observations, allocated memory is kept."""
+        self.size = 0
+
+    def view(self, i: int) -> RigidObject:
+        """
+        Create RigidObject of one observation.
+
+        :param i: index of the observation
+        :return: RigidObject with copied data
+        """
+        im_x, im_y = self.data["im_xy"][i]
+        w, h = self.data["wh"][i]
+        obj = RigidObject(int(im_x), int(im_y), int(w), int(h),
+                          RigidType(int(self.data["o_type"][i])),
+                          COLORS[self.data["c_type"][i]])
+        obj.set_position(Point(*(float(v) for v in self.data["xy"][i])))
+        return obj
+
+    def views(self, mask: np.ndarray = None) -> list:
+        """
+        Create RigidObjects of selected observations.
+
+        :param mask: boolean mask or indices, all observations by default
+        :return: list of RigidObject
+        """
+        indices = np.arange(self.size)
+        if mask is not None:
+            indices = indices[mask]
+        return [self.view(i) for i in indices]
+
+    def mask(self, o_type: RigidType) -> np.ndarray:
+        """
+        Select observations of given type.
+
+        :param o_type: requested type
+        :return: boolean mask
+        """
+        return self.column("o_type") == o_type.value
+
+    def within(self, point: Point, radius: float,
+               o_type: RigidType = None) -> np.ndarray:
+        """
+        Find observations closer to point than radius.
+
+        :param point: reference point
+        :param radius: maximal distance
+        :param o_type: requested type, all types by default
+        :return: indices of the observations
+        """
+        dist_sq = np.sum(np.square(self.xy - (point.x, point.y)), axis=1)
+        mask = dist_sq < radius * radius
+        if o_type is not None:
+            mask &= self.mask(o_type)
+        return np.flatnonzero(mask)
@@ -0,0 +1,130 @@
+"""Timestamped history of robot positions used in robot.py."""
+
+
+import numpy as np
+from geometry import Point, normalize_angle
+from constants import LINEAR_CORRECTION, ANGULAR_CORRECTION
+
+
+ODOMETRY_CAPACITY = 1024
+
+
+class OdometryBuffer:
+    """
+    Fixed-size ring buffer of (time, x, y, angle) samples.
+
+    The oldest samples are overwritten when the buffer is full.
+    """
+
+    def __init__(self, capacity: int = ODOMETRY_CAPACITY) -> None:
+        """
+        Create OdometryBuffer instance.
+
+        :param capacity: maximal number of kept samples
+        """
+        self.data = np.zeros((capacity, 4))
+        self.start = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        """Return number of kept samples."""
+        return self.size
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"OdometryBuffer of {self.size}/{len(self.data)} samples"
+
+    def clear(self) -> None:
+        """Forget all samples."""
+        self.start = 0
+        self.size = 0
+
+    def push(self, stamp: float, pose: Point) -> None:
+        """
+        Add a new sample, stamps are expected to be increasing.
+
+        :param stamp: time from time.monotonic
+        :param pose: robot position at stamp
+        """
+        capacity = len(self.data)
+        self.data[(self.start + self.size) % capacity] = (
+            stamp, pose.x, pose.y, pose.angle)
+        if self.size < capacity:
+            self.size += 1
+        else:
+            self.start = (self.start + 1) % capacity
+
+    def samples(self) -> np.ndarray:
+        """
+        Get kept samples from the oldest one.
+
+        :return: array of shape (n, 4) with columns time, x, y, angle
+        """
+        end = self.start + self.size
+        if end <= len(self.data):
+            return self.data[self.start:end]
+        return np.concatenate((self.data[self.start:],
+                               self.data[:end - len(self.data)]))
+
+    def latest(self) -> tuple:
+        """
+        Get the newest sample.
+
+        :return: time and Point, None if the buffer is empty
+        """
+        if not self.size:
+            return None
+        stamp, x, y, angle = self.data[(self.start + self.size - 1) %
+                                       len(self.data)]
+        return float(stamp), Point(float(x), float(y), float(angle))
+
+    def pose_at(self, stamp: float) -> Point:
+        """
+        Interpolate robot position at a given time.
+
+        Times outside of the kept range are clamped to the oldest or the
+        newest sample.
+
+        :param stamp: requested time
+        :return: interpolated position, None if the buffer is empty
+        """
+        if not self.size:
+            return None
+        samples = self.samples()
+        k = np.searchsorted(samples[:, 0], stamp)
+        if k == 0:
+            return Point(*samples[0, 1:].tolist())
+        if k == len(samples):
+            return Point(*samples[-1, 1:].tolist())
+        (t0, x0, y0, a0), (t1, x1, y1, a1) = samples[k - 1], samples[k]
+        ratio = (stamp - t0) / (t1 - t0) if t1 > t0 else 1
+        return Point(x0 + ratio * (x1 - x0), y0 + ratio * (y1 - y0),
+                     normalize_angle(a0 + ratio * normalize_angle(a1 - a0)))
+
+
+class OdometrySnapshot:
+    """Odometry read once per control tick with corrections applied."""
+
+    def __init__(self, stamp: float, raw: tuple, base: Point,
+                 use_correction: bool = True) -> None:
+        """
+        Create OdometrySnapshot instance.
+
+        :param stamp: time of the reading from time.monotonic
+        :param raw: (x, y, angle) odometry since the last reset
+        :param base: robot position when odometry was reset
+        :param use_correction: boolean for using predefined correction
+        """
+        x, y, angle = raw
+        if use_correction:
+            x, y = x * LINEAR_CORRECTION, y * LINEAR_CORRECTION
+            angle = angle * ANGULAR_CORRECTION
+        self.stamp = stamp
+        self.x, self.y, self.angle = x, y, angle
+        self.pose = Point(base.x + x * base.cos - y * base.sin,
+                          base.y + x * base.sin + y * base.cos,
+                          normalize_angle(base.angle + angle))
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"{self.pose} at {self.stamp:.3f}"
@@ -0,0 +1,205 @@
+"""
+Visibility-graph route planner avoiding danger zones.
+
+Used as an alternative to the detour algorithm of Map.routing.
+"""
+
+
+import heapq
+from enum import Enum
+
+import numpy as np
+from geometry import Circle, CircleArray, Point, PointArray, SegmentArray
+
+
+POLYGON_SIDES = 8
+INFLATION = 0.05
+
+
+class PlannerMode(Enum):
+    """Enum of route planners."""
+
+    DETOUR = 1
+    VISIBILITY = 2
+
+
+def on_circle(zone: Circle, r: float, angles: np.ndarray) -> list:
+    """
+    Get points on a circle concentric with zone.
+
+    :param zone: danger zone
+    :param r: radius of the circle
+    :param angles: angles of the points
+    :return: list of Points
+    """
+    return [Point(zone.c.x + r * np.cos(a), zone.c.y + r * np.sin(a))
+            for a in angles]
+
+
+def polygon_points(zone: Circle, inflation: float = INFLATION,
+                   sides: int = POLYGON_SIDES) -> list:
+    """
+    Get vertices of a regular polygon circumscribed around inflated zone.
+
+    Edges between neighboring vertices are tangent to the inflated circle,
+    so moving along them never enters the zone.
+
+    :param zone: danger zone
+    :param inflation: margin added to the radius
+    :param sides: number of vertices
+    :return: list of Points
+    """
+    r = (zone.r + inflation) / np.cos(np.pi / sides)
+    return on_circle(zone, r, np.arange(sides) * 2 * np.pi / sides)
+
+
+def tangent_points(zones: list, points: list,
+                   inflation: float = INFLATION) -> list:
+    """
+    Get touching points of tangents of inflated zones.
+
+    Tangents from each of points to each zone and common tangents of each
+    pair of zones are used.
+
+    :param zones: list of danger zones (Circles)
+    :param points: list of points outside zones (start, finish)
+    :param inflation: margin added to the radius
+    :return: list of Points
+    """
+    tangents = []
+    for zone in zones:
+        r = zone.r + inflation
+        for p in points:
+            d = zone.c.distance(p)
+            if d > r:
+                base = zone.c.relative_angle(p)
+                spread = np.arccos(r / d)
+                tangents += on_circle(zone, r, (base - spread, base + spread))
+    for k, zone_a in enumerate(zones):
+        for zone_b in zones[k + 1:]:
+            r_a, r_b = zone_a.r + inflation, zone_b.r + inflation
+            d = zone_a.c.distance(zone_b.c)
+            base = zone_a.c.relative_angle(zone_b.c)
+            if d > abs(r_a - r_b):  # outer tangents
+                spread = np.arccos((r_a - r_b) / d)
+                angles = (base - spread, base + spread)
+                tangents += on_circle(zone_a, r_a, angles)
+                tangents += on_circle(zone_b, r_b, angles)
+            if d > r_a + r_b:  # inner tangents
+                spread = np.arccos((r_a + r_b) / d)
+                angles = np.array((base - spread, base + spread))
+                tangents += on_circle(zone_a, r_a, angles)
+                tangents += on_circle(zone_b, r_b, angles + np.pi)
+    return tangents
+
+
+def visibility_route(s_pos: Point, f_pos: Point, zones: list,
+                     inflation: float = INFLATION,
+                     sides: int = POLYGON_SIDES) -> list:
+    """
+    Find the shortest route from s_pos to f_pos avoiding zones.
+
+    A* search over the visibility graph of tangent points of all zones,
+    vertices of polygons around zones let the route go around them.
+    Zones containing s_pos are ignored for the first leg of the route, so
+    the robot can leave a zone it is already in.
+
+    :param s_pos: starting position
+    :param f_pos: finish position
+    :param zones: list of danger zones (Circles)
+    :param inflation: margin added to the radius of zones
+    :param sides: number of polygon vertices per zone
+    :return: list of positions along the route, empty if there is none
+    """
+    circles = CircleArray.from_circles(zones)
+    if np.any(circles.is_inner(PointArray.from_points([f_pos]))):
+        return []
+    outside_start = ~circles.is_inner(PointArray.from_points([s_pos]))[:, 0]
+
+    candidates = tangent_points(zones, [s_pos, f_pos], inflation)
+    for zone in zones:
+        candidates += polygon_points(zone, inflation, sides)
+    free = ~np.any(circles.is_inner(PointArray.from_points(candidates)),
+                   axis=0)
+    nodes = [s_pos, f_pos] + [p for p, ok in zip(candidates, free) if ok]
+    node_xy = PointArray.from_points(nodes)
+    to_finish = node_xy.distance(PointArray.from_points([f_pos]))[:, 0]
+
+    def visible_from(i: int) -> np.ndarray:
+        start = PointArray(np.repeat(node_xy.xy[i:i + 1], len(nodes), axis=0))
+        crossing = circles.crosses(SegmentArray(start, node_xy))
+        if i == 0:
+            crossing = crossing[:, outside_start]
+        return ~np.any(crossing, axis=1)
+
+    # A* with straight-line heuristic, edges are evaluated lazily
+    dist = {0: 0.0}
+    previous = {}
+    queue = [(to_finish[0], 0)]
+    closed = set()
+    while queue:
+        _, i = heapq.heappop(queue)
+        if i in closed:
+            continue
+        if i == 1:
+            break
+        closed.add(i)
+        edges = node_xy.distance(PointArray(node_xy.xy[i]))[:, 0]
+        for j in np.flatnonzero(visible_from(i)):
+            if j in closed or j == i or j == 0:
+                continue
+            new_dist = dist[i] + edges[j]
+            if new_dist < dist.get(j, np.inf):
+                dist[j] = new_dist
+                previous[j] = i
+                heapq.heappush(queue, (new_dist + to_finish[j], j))
+    if 1 not in previous:
+        return []
+
+    route = [f_pos]
+    i = 1
+    while i != 0:
+        i = previous[i]
+        route.append(nodes[i])
+    return route[::-1]
+
+
+def lookahead_point(route: list, segment: int, position: Point,
+                    lookahead: float) -> tuple:
+    """
+    Find the point of the route lookahead ahead of position.
+
+    Position is projected onto the route starting from segment, the current
+    segment only moves forward.
+
+    :param route: list of positions along the route
+    :param segment: index of the current segment (route[k] to route[k + 1])
+    :param position: current position
+    :param lookahead: distance to go along the route from the projection
+    :return: lookahead Point and index of the current segment
+    """
+    def projection(k: int) -> float:
+        a, b = route[k], route[k + 1]
+        dx, dy = b.x - a.x, b.y - a.y
+        length_sq = dx * dx + dy * dy
+        if length_sq == 0:
+            return 1.0
+        return ((position.x - a.x) * dx + (position.y - a.y) * dy) / length_sq
+
+    while segment < len(route) - 2 and projection(segment) >= 1:
+        segment += 1
+    t = min(max(projection(segment), 0.0), 1.0)
+    a, b = route[segment], route[segment + 1]
+    current = Point(a.x + t * (b.x - a.x), a.y + t * (b.y - a.y))
+
+    remaining = lookahead
+    for k in range(segment, len(route) - 1):
+        end = route[k + 1]
+        step = current.distance(end)
+        if step >= remaining:
+            ratio = remaining / step
+            return Point(current.x + ratio * (end.x - current.x),
+                         current.y + ratio * (end.y - current.y)), segment
+        remaining -= step
+        current = Point(end.x, end.y)
+    return Point(route[-1].x, route[-1].y), segment
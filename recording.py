@@ -0,0 +1,704 @@
+"""
+Recording of sensor data during a mission and its replay.
+
+The log is a directory with meta.json and chunks of every stream saved as
+.npz files with the stamps and the data of the records. A chunk holds up to
+chunk_bytes of data or chunk_period seconds of a stream.
+"""
+
+
+import json
+import math
+import os
+import queue
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+
+# data of a stream in one chunk, about 4 point clouds of 640x480
+CHUNK_BYTES = 16 * 2 ** 20
+# time span of a chunk, so slow streams are written during the mission too
+CHUNK_PERIOD = 5.0
+# records waiting for the writer thread, newer records are dropped above it,
+# about a second of RGB and depth images
+MAX_PENDING_BYTES = 64 * 2 ** 20
+# time given to the stream threads of RecordingTurtle to stop
+STOP_TIMEOUT = 1.0
+# added to waiting for a record, so it is surely due after waking up
+SLEEP_MARGIN = 1e-6
+# the program gets a moment to react to the last records of the log
+END_MARGIN = 0.1
+# period of firing recorded bumper and button events in real time
+EVENT_PERIOD = 0.01
+# largest time between an RGB image and the depth image or point cloud
+# replayed with it, about three frames of the camera
+MATCH_TOLERANCE = 0.1
+LOG_VERSION = 2
+
+# camera streams of the turtle and their wait and get methods
+FRAME_STREAMS = {
+    "rgb": ("wait_for_rgb_image", "get_rgb_image"),
+    "depth": ("wait_for_depth_image", "get_depth_image"),
+    "pc": ("wait_for_point_cloud", "get_point_cloud"),
+}
+ODOMETRY_STREAM = "odometry"
+COMMAND_STREAM = "cmd"
+BUTTON_STREAM = "button"
+BUMPER_STREAM = "bumper"
+
+
+def chunk_path(path: str, stream: str, index: int) -> str:
+    """
+    Get file name of a chunk.
+
+    :param path: directory of the log
+    :param stream: name of the stream
+    :param index: index of the chunk
+    :return: path of the .npz file
+    """
+    return os.path.join(path, f"{stream}_{index:05d}.npz")
+
+
+def closest_index(stamps: np.ndarray, stamp: float) -> int:
+    """
+    Find the record closest in time.
+
+    :param stamps: sorted non-empty array of stamps
+    :param stamp: time to match
+    :return: index of the closest stamp
+    """
+    i = int(np.searchsorted(stamps, stamp))
+    if i == len(stamps) or (i > 0 and
+                            stamp - stamps[i - 1] < stamps[i] - stamp):
+        i -= 1
+    return i
+
+
+class Recorder:
+    """
+    Append-only chunked log of timestamped records.
+
+    Appending only copies the record to a queue, the chunks are written by
+    a background thread, so the control loop never waits for the disk.
+    Records of a stream are collected and written as one chunk when they
+    exceed chunk_bytes or chunk_period, so memory stays bounded during long
+    missions. When the writer falls more than MAX_PENDING_BYTES behind, new
+    records are dropped and counted. Appending is thread-safe.
+    """
+
+    def __init__(self, path: str, chunk_bytes: int = CHUNK_BYTES,
+                 chunk_period: float = CHUNK_PERIOD, meta: dict = None,
+                 clock: any = time.monotonic) -> None:
+        """
+        Create Recorder instance and start its writer thread.
+
+        :param path: directory of the log, created if missing
+        :param chunk_bytes: maximal size of data of a chunk
+        :param chunk_period: maximal time span of a chunk in seconds
+        :param meta: additional JSON serializable data of the log
+        :param clock: function returning current time
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunk_bytes = chunk_bytes
+        self.chunk_period = chunk_period
+        self.meta = dict(meta or {})
+        self.clock = clock
+        self.start = clock()
+        self.buffers = {}
+        self.sizes = {}
+        self.chunks = {}
+        self.queue = queue.Queue()
+        self.pending = 0
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"Recorder of {sorted(self.chunks)} to {self.path}"
+
+    def now(self) -> float:
+        """
+        Get time since the start of the recording.
+
+        :return: stamp in seconds
+        """
+        return self.clock() - self.start
+
+    def append(self, stream: str, data: any, stamp: float = None,
+               copy: bool = True) -> None:
+        """
+        Add one record, it is written later.
+
+        :param stream: name of the stream
+        :param data: array-like record, all records of a stream have the
+                     same shape and dtype
+        :param stamp: time since the start, now by default
+        :param copy: boolean, False when data is an array which is never
+                     changed by the caller
+        """
+        stamp = self.now() if stamp is None else stamp
+        data = np.array(data) if copy else np.asarray(data)
+        with self.lock:
+            if self.closed:
+                return
+            if self.pending + data.nbytes > MAX_PENDING_BYTES:
+                self.dropped += 1
+                return
+            self.pending += data.nbytes
+        self.queue.put((stream, stamp, data))
+
+    def run(self) -> None:
+        """Write queued records in chunks, runs in the writer thread."""
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            stream, stamp, data = item
+            buffer = self.buffers.setdefault(stream, [])
+            buffer.append((stamp, data))
+            self.sizes[stream] = self.sizes.get(stream, 0) + data.nbytes
+            if (self.sizes[stream] >= self.chunk_bytes or
+                    stamp - buffer[0][0] >= self.chunk_period):
+                self.flush(stream)
+            with self.lock:
+                self.pending -= data.nbytes
+        for stream in list(self.buffers):
+            self.flush(stream)
+
+    def flush(self, stream: str) -> None:
+        """
+        Write buffered records of a stream as a new chunk.
+
+        :param stream: name of the stream
+        """
+        buffer = self.buffers.pop(stream, [])
+        self.sizes.pop(stream, None)
+        if not buffer:
+            return
+        index = self.chunks.get(stream, 0)
+        np.savez(chunk_path(self.path, stream, index),
+                 stamp=np.array([s for s, _ in buffer]),
+                 data=np.stack([d for _, d in buffer]))
+        self.chunks[stream] = index + 1
+
+    def set_meta(self, key: str, value: any) -> None:
+        """
+        Store additional data of the log.
+
+        :param key: name of the value
+        :param value: JSON serializable value, arrays are converted to lists
+        """
+        with self.lock:
+            self.meta[key] = np.asarray(value).tolist()
+
+    def close(self) -> None:
+        """Write all queued records and meta.json, can be called twice."""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"version": LOG_VERSION,
+                       "chunk_bytes": self.chunk_bytes,
+                       "chunk_period": self.chunk_period,
+                       "chunks": self.chunks,
+                       "dropped": self.dropped,
+                       "duration": self.now(),
+                       "meta": self.meta}, f, indent=1)
+
+
+class LogReader:
+    """
+    Random access to a log written by Recorder.
+
+    Stamps of all chunks are read at once, data of one chunk per stream
+    is kept loaded.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Create LogReader instance.
+
+        :param path: directory of the log
+        """
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            info = json.load(f)
+        self.duration = info["duration"]
+        self.meta = info["meta"]
+        self.stamps = {}
+        self.offsets = {}
+        for stream, count in info["chunks"].items():
+            stamps = []
+            for index in range(count):
+                with np.load(chunk_path(path, stream, index)) as chunk:
+                    stamps.append(chunk["stamp"])
+            self.offsets[stream] = np.cumsum([0] + [len(s) for s in stamps])
+            self.stamps[stream] = np.concatenate(stamps)
+        self.loaded = {}
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        counts = {s: len(t) for s, t in self.stamps.items()}
+        return f"Log of {counts} in {self.duration:.1f} s at {self.path}"
+
+    def __contains__(self, stream: str) -> bool:
+        """Decide whether the log has any record of stream."""
+        return stream in self.stamps
+
+    def count(self, stream: str) -> int:
+        """
+        Get number of records of a stream.
+
+        :param stream: name of the stream
+        :return: number of records, 0 for unknown streams
+        """
+        return len(self.stamps.get(stream, ()))
+
+    def read(self, stream: str, i: int) -> np.ndarray:
+        """
+        Get record of a stream by index.
+
+        :param stream: name of the stream
+        :param i: index of the record
+        :return: data of the record
+        """
+        index = int(np.searchsorted(self.offsets[stream], i, side="right")) - 1
+        if self.loaded.get(stream, (None,))[0] != index:
+            with np.load(chunk_path(self.path, stream, index)) as chunk:
+                self.loaded[stream] = (index, chunk["data"])
+        return self.loaded[stream][1][i - self.offsets[stream][index]]
+
+    def read_all(self, stream: str) -> np.ndarray:
+        """
+        Get all records of a small stream at once.
+
+        :param stream: name of the stream
+        :return: data of the records stacked
+        """
+        chunks = []
+        for index in range(len(self.offsets[stream]) - 1):
+            with np.load(chunk_path(self.path, stream, index)) as chunk:
+                chunks.append(chunk["data"])
+        return np.concatenate(chunks)
+
+    def index_at(self, stream: str, stamp: float) -> int:
+        """
+        Find the newest record at a given time.
+
+        :param stream: name of the stream
+        :param stamp: time since the start
+        :return: index of the record, -1 if there is none yet
+        """
+        if stream not in self.stamps:
+            return -1
+        return int(np.searchsorted(self.stamps[stream], stamp,
+                                   side="right")) - 1
+
+
+class RecordingTurtle:
+    """
+    Turtle proxy logging the sensor data of the turtle.
+
+    Every recorded camera stream has a thread waiting for its messages, so
+    each message is logged once, whether the program reads it or not, and
+    frames are never compared. Point clouds are large and recorded only on
+    request, replay them from depth images otherwise. With a virtual clock
+    the frames are captured after every wait_for_rgb_image instead.
+    Odometry is logged as the program reads it, with a flag marking the
+    reading just before every reset, so the absolute motion can be
+    reconstructed. Velocity commands and bumper and button events are
+    logged as well, other calls are passed through.
+    """
+
+    def __init__(self, turtle: any, recorder: Recorder,
+                 point_cloud: bool = False,
+                 background: bool = True) -> None:
+        """
+        Create RecordingTurtle instance and start recording the cameras.
+
+        :param turtle: turtle instance
+        :param recorder: Recorder of the log
+        :param point_cloud: boolean for recording point clouds
+        :param background: boolean, False captures frames after every
+                           wait_for_rgb_image of the program
+        """
+        self.turtle = turtle
+        self.recorder = recorder
+        self.streams = {stream: methods
+                        for stream, methods in FRAME_STREAMS.items()
+                        if (point_cloud or stream != "pc") and
+                        all(hasattr(turtle, m) for m in methods)}
+        for name, getter in (("K_rgb", "get_rgb_K"),
+                             ("K_depth", "get_depth_K")):
+            try:
+                recorder.set_meta(name, getattr(turtle, getter)())
+            except (AttributeError, TypeError):
+                pass  # camera info not available yet
+        self.background = background
+        self.running = True
+        self.threads = [threading.Thread(target=self.record, args=(stream,),
+                                         daemon=True)
+                        for stream in self.streams] if background else []
+        for thread in self.threads:
+            thread.start()
+
+    def __getattr__(self, name: str) -> any:
+        """Pass other attributes to the turtle."""
+        return getattr(self.turtle, name)
+
+    def close(self) -> None:
+        """Stop recording the cameras and close the recorder."""
+        self.running = False
+        for thread in self.threads:
+            # a thread still waiting for a message is not logged any more
+            thread.join(STOP_TIMEOUT)
+        self.threads = []
+        self.recorder.close()
+
+    def record(self, stream: str) -> None:
+        """
+        Log every message of a camera stream, runs in its own thread.
+
+        :param stream: name of the stream
+        """
+        wait, get = self.streams[stream]
+        while self.running and not self.turtle.is_shutting_down():
+            getattr(self.turtle, wait)()
+            self.frame(stream, getattr(self.turtle, get)())
+
+    def capture(self) -> None:
+        """Log the current frame of every recorded camera stream."""
+        for stream, (_, get) in self.streams.items():
+            self.frame(stream, getattr(self.turtle, get)())
+
+    def frame(self, stream: str, data: np.ndarray) -> None:
+        """
+        Log a frame without copying it.
+
+        The turtle creates a new array for every message and never changes
+        it afterwards.
+
+        :param stream: name of the stream
+        :param data: image returned by the turtle, None is skipped
+        """
+        if data is not None:
+            self.recorder.append(stream, data, copy=False)
+
+    def wait_for_rgb_image(self) -> None:
+        """Wait for the next frame, capture it without background threads."""
+        self.turtle.wait_for_rgb_image()
+        if not self.background:
+            self.capture()
+
+    def get_odometry(self) -> tuple:
+        """Get and log odometry."""
+        odometry = self.turtle.get_odometry()
+        self.recorder.append(ODOMETRY_STREAM, tuple(odometry) + (0,))
+        return odometry
+
+    def wait_for_odometry(self) -> None:
+        """Wait for odometry and log it, replay waits for the same time."""
+        self.turtle.wait_for_odometry()
+        self.get_odometry()
+
+    def reset_odometry(self) -> None:
+        """Log the last odometry and reset it."""
+        odometry = self.turtle.get_odometry()
+        self.recorder.append(ODOMETRY_STREAM, tuple(odometry) + (1,))
+        self.turtle.reset_odometry()
+
+    def cmd_velocity(self, linear: float = 0, angular: float = 0) -> None:
+        """Log and send velocity command."""
+        self.recorder.append(COMMAND_STREAM, (linear, angular))
+        self.turtle.cmd_velocity(linear=linear, angular=angular)
+
+    def register_bumper_event_cb(self, cb: any) -> None:
+        """Register bumper callback, its events are logged."""
+        def logged(msg: any) -> None:
+            self.recorder.append(BUMPER_STREAM, (msg.bumper, msg.state))
+            cb(msg)
+        self.turtle.register_bumper_event_cb(logged)
+
+    def register_button_event_cb(self, cb: any) -> None:
+        """Register button callback, its events are logged."""
+        def logged(msg: any) -> None:
+            self.recorder.append(BUTTON_STREAM, (msg.button, msg.state))
+            cb(msg)
+        self.turtle.register_button_event_cb(logged)
+
+
+def absolute_odometry(records: np.ndarray) -> np.ndarray:
+    """
+    Chain odometry readings between resets into one motion.
+
+    :param records: rows of x, y, angle and reset flag
+    :return: rows of x, y, angle since the start of the recording
+    """
+    poses = np.empty((len(records), 3))
+    bx, by, ba = 0.0, 0.0, 0.0
+    for i, (x, y, a, reset) in enumerate(records):
+        c, s = math.cos(ba), math.sin(ba)
+        poses[i] = bx + c * x - s * y, by + s * x + c * y, ba + a
+        if reset:
+            bx, by, ba = poses[i]
+    return poses
+
+
+class ReplayTurtle:
+    """
+    Turtle feeding a recorded log back to Robot.
+
+    Time of the log runs speed times faster than the clock. Sensor data are
+    the newest records at the current time of the log, depth images and
+    point clouds the records closest to the RGB image. Velocity commands
+    are ignored, so the robot moves exactly as during the recording.
+    Odometry is reset independently of the recording.
+
+    The program has to run in the time of the log (now, sleep and
+    ReplayRate) to see the same data at any speed of the replay.
+    """
+
+    def __init__(self, path: str, speed: float = 1,
+                 clock: any = time.monotonic,
+                 sleep: any = time.sleep,
+                 match_tolerance: float = MATCH_TOLERANCE) -> None:
+        """
+        Create ReplayTurtle instance.
+
+        :param path: directory of the log
+        :param speed: speed of the replay, 1 for the recorded speed
+        :param clock: function returning current time
+        :param sleep: sleep function of the same time base as clock
+        :param match_tolerance: largest time in seconds between an RGB image
+                                and the depth image or point cloud of it
+        """
+        self.log = LogReader(path)
+        self.speed = speed
+        self.match_tolerance = match_tolerance
+        self.clock = clock
+        self.sleep_func = sleep
+        self.start = clock()
+        if ODOMETRY_STREAM in self.log:
+            self.poses = absolute_odometry(self.log.read_all(ODOMETRY_STREAM))
+        else:
+            self.poses = np.zeros((0, 3))
+        self.base = np.zeros(3)
+        self.served = {}
+        self.events = {}
+        self.callbacks = {}
+        self.events_lock = threading.Lock()
+        # events are due also while the program only sleeps
+        if hasattr(clock, "listeners"):
+            clock.listeners.append(lambda _: self.now())
+        else:
+            threading.Thread(target=self.poll_events, daemon=True).start()
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"ReplayTurtle at {self.now():.2f} s of {self.log}"
+
+    def now(self) -> float:
+        """
+        Get current time of the log, pending events are fired.
+
+        :return: time since the start of the recording
+        """
+        stamp = (self.clock() - self.start) * self.speed
+        with self.events_lock:
+            for stream, cb in self.callbacks.items():
+                done = self.events.get(stream, 0)
+                end = self.log.index_at(stream, stamp) + 1
+                field = "bumper" if stream == BUMPER_STREAM else "button"
+                for i in range(done, end):
+                    self.events[stream] = i + 1
+                    index, state = self.log.read(stream, i)
+                    cb(SimpleNamespace(**{field: int(index)},
+                                       state=int(state)))
+        return stamp
+
+    def sleep(self, duration: float) -> None:
+        """
+        Sleep in the time of the log.
+
+        :param duration: time in seconds of the log
+        """
+        self.sleep_func(duration / self.speed)
+
+    def poll_events(self) -> None:
+        """Fire due events until the replay ends, runs in a thread."""
+        while not self.is_shutting_down():
+            time.sleep(EVENT_PERIOD)
+
+    def serve(self, stream: str) -> int:
+        """
+        Get index of the newest record of a stream and mark it as served.
+
+        :param stream: name of the stream
+        :return: index of the record, -1 if there is none yet
+        """
+        i = self.log.index_at(stream, self.now())
+        self.served[stream] = i
+        return i
+
+    def wait_until(self, stream: str) -> None:
+        """
+        Sleep until there is a record of a stream not served yet.
+
+        :param stream: name of the stream
+        """
+        now = self.now()
+        i = self.served.get(stream, -1) + 1
+        if i < self.log.count(stream) and self.log.stamps[stream][i] > now:
+            self.sleep(self.log.stamps[stream][i] - now + SLEEP_MARGIN)
+
+    def latest(self, stream: str) -> np.ndarray:
+        """
+        Get the newest record of a stream.
+
+        :param stream: name of the stream
+        :return: data, the first record before it was recorded
+        """
+        self.require(stream)
+        return self.log.read(stream, max(self.serve(stream), 0))
+
+    def matching(self, stream: str) -> np.ndarray:
+        """
+        Get the record of a stream captured together with the RGB image.
+
+        The record closest in time to the newest RGB image is used, it must
+        not be more than match_tolerance apart.
+
+        :param stream: name of the frame stream
+        :return: data of the record
+        """
+        self.require(stream)
+        self.require("rgb")
+        rgb = self.log.stamps["rgb"][max(self.log.index_at("rgb",
+                                                           self.now()), 0)]
+        i = closest_index(self.log.stamps[stream], rgb)
+        skew = abs(self.log.stamps[stream][i] - rgb)
+        if skew > self.match_tolerance:
+            raise ValueError(f"No {stream} record within "
+                             f"{self.match_tolerance} s of the RGB image at "
+                             f"{rgb:.3f} s, the closest is {skew:.3f} s apart")
+        return self.log.read(stream, i)
+
+    def require(self, stream: str) -> None:
+        """
+        Make sure the log has records of a stream.
+
+        :param stream: name of the stream
+        """
+        if not self.log.count(stream):
+            raise ValueError(f"{self.log.path} has no {stream} records, "
+                             f"it has {sorted(self.log.stamps)}")
+
+    def register_bumper_event_cb(self, cb: any) -> None:
+        """Register bumper callback, recorded events are replayed."""
+        self.callbacks[BUMPER_STREAM] = cb
+
+    def register_button_event_cb(self, cb: any) -> None:
+        """Register button callback, recorded events are replayed."""
+        self.callbacks[BUTTON_STREAM] = cb
+
+    def is_shutting_down(self) -> bool:
+        """Decide whether the replay has ended."""
+        return self.now() > self.log.duration + END_MARGIN
+
+    def cmd_velocity(self, linear: float = 0, angular: float = 0) -> None:
+        """Ignore velocity command, the recorded motion is replayed."""
+
+    def play_sound(self, sound_id: int = 0) -> None:
+        """Ignore sound."""
+
+    def pose(self) -> np.ndarray:
+        """
+        Get recorded absolute odometry at the current time.
+
+        :return: x, y, angle since the start of the recording
+        """
+        i = self.serve(ODOMETRY_STREAM)
+        return self.poses[i] if i >= 0 else np.zeros(3)
+
+    def reset_odometry(self) -> None:
+        """Start odometry from the current recorded position."""
+        self.base = self.pose()
+
+    def wait_for_odometry(self) -> None:
+        """Wait for the next recorded odometry."""
+        self.wait_until(ODOMETRY_STREAM)
+
+    def get_odometry(self) -> tuple:
+        """
+        Get odometry since the last reset.
+
+        :return: x, y, angle in the frame of the reset position
+        """
+        (x, y, a), (bx, by, ba) = self.pose(), self.base
+        c, s = math.cos(ba), math.sin(ba)
+        dx, dy = x - bx, y - by
+        angle = math.atan2(math.sin(a - ba), math.cos(a - ba))
+        return c * dx + s * dy, -s * dx + c * dy, angle
+
+    def wait_for_rgb_image(self) -> None:
+        """Wait for the next recorded RGB image."""
+        self.wait_until("rgb")
+
+    def wait_for_depth_image(self) -> None:
+        """Depth image is recorded with the RGB image."""
+
+    def wait_for_point_cloud(self) -> None:
+        """Point cloud is recorded with the RGB image."""
+
+    def get_rgb_image(self) -> np.ndarray:
+        """Get recorded RGB image."""
+        return self.latest("rgb")
+
+    def get_depth_image(self) -> np.ndarray:
+        """Get recorded depth image."""
+        return self.matching("depth")
+
+    def get_point_cloud(self) -> np.ndarray:
+        """Get recorded point cloud."""
+        return self.matching("pc")
+
+    def get_rgb_K(self) -> np.ndarray:
+        """Get recorded intrinsic matrix of the RGB camera."""
+        return np.array(self.log.meta.get("K_rgb"))
+
+    def get_depth_K(self) -> np.ndarray:
+        """Get recorded intrinsic matrix of the depth camera."""
+        return np.array(self.log.meta.get("K_depth"))
+
+
+class ReplayRate:
+    """Rate in the time of the log of a ReplayTurtle."""
+
+    def __init__(self, turtle: ReplayTurtle, hz: float) -> None:
+        """
+        Create ReplayRate instance.
+
+        :param turtle: replayed turtle
+        :param hz: frequency of the loop
+        """
+        self.turtle = turtle
+        self.period = 1 / hz
+        self.last = turtle.now()
+
+    def sleep(self) -> None:
+        """Sleep until the next deadline, or not at all when it has passed."""
+        deadline = self.last + self.period
+        delay = deadline - self.turtle.now()
+        if delay > 0:
+            self.turtle.sleep(delay)
+        self.last = max(deadline, self.turtle.now())
@@ -1,5 +1,6 @@
 """Module to define a rigid object body, its color and properties."""
 
+import warnings
 from enum import Enum
 
 import numpy as np
@@ -9,6 +10,11 @@ from geometry import Point
 RADIUS_POLE = 0.025
 RADIUS_BALL = 0.11
 
+# half size of the window around object center used for depth in px
+DEPTH_WINDOW = 2
+# integer depth images are in millimeters
+DEPTH_SCALE = 0.001
+
 
 class ColorType(Enum):
     """Enum of colors."""
@@ -101,6 +107,17 @@ class RigidObject:
         """
         return self.im_p.xy
 
+    def copy(self) -> 'RigidObject':
+        """
+        Create independent copy of the object.
+
+        :return: new RigidObject with the same data
+        """
+        new = RigidObject(self.im_p.x, self.im_p.y, self.w, self.h,
+                          self.o_type, self.c_type)
+        new.set_position(Point(self.p.x, self.p.y, self.p.angle))
+        return new
+
     def set_position(self, new_pos: Point) -> None:
         """
         Set real-world coordinates.
@@ -110,6 +127,14 @@ class RigidObject:
         """
         self.p = new_pos
 
+    def is_valid(self) -> bool:
+        """
+        Decide whether real-world coordinates were assigned successfully.
+
+        :return: boolean
+        """
+        return bool(np.all(np.isfinite(self.xy)))
+
     def assign_xy(self, pc: np.ndarray) -> None:
         """
         Assign x, y data from point cloud.
@@ -117,12 +142,82 @@ class RigidObject:
         :param pc: Point cloud
         :return:
         """
-        r = 0
-        # r = (RADIUS_BALL if self.o_type == RigidType.BALL else RADIUS_POLE)
-        vector = (pc[self.im_p.xy[1]][self.im_p.xy[0]][0],
-                  pc[self.im_p.xy[1]][self.im_p.xy[0]][2])
-        norm = np.linalg.norm(vector)
-        self.p.x = (pc[self.im_p.xy[1]][self.im_p.xy[0]][2] +
-                    r * vector[0] / norm)
-        self.p.y = (-pc[self.im_p.xy[1]][self.im_p.xy[0]][0] +
-                    r * vector[1] / norm)
+        assign_xy_batch([self], pc)
+
+
+def window_samples(objects: list, data: np.ndarray,
+                   half: int = DEPTH_WINDOW) -> np.ndarray:
+    """
+    Gather a square window of data around each object center at once.
+
+    Windows are clipped to the image borders.
+
+    :param objects: list of RigidObject
+    :param data: image-shaped array (point cloud, depth image)
+    :param half: half size of the window in px
+    :return: array of shape (len(objects), (2 * half + 1) ** 2, ...)
+    """
+    centers = np.array([o.im_position for o in objects], dtype=int)
+    offsets = np.arange(-half, half + 1)
+    dy, dx = np.meshgrid(offsets, offsets, indexing="ij")
+    cols = np.clip(centers[:, 0, None] + dx.ravel(), 0, data.shape[1] - 1)
+    rows = np.clip(centers[:, 1, None] + dy.ravel(), 0, data.shape[0] - 1)
+    return data[rows, cols]
+
+
+def robust_median(samples: np.ndarray) -> np.ndarray:
+    """
+    Median over the window axis ignoring invalid (NaN) samples.
+
+    :param samples: array of shape (objects, window, ...)
+    :return: medians, NaN where the whole window is invalid
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN windows
+        return np.nanmedian(samples, axis=1)
+
+
+def assign_xy_batch(objects: list, pc: np.ndarray,
+                    half: int = DEPTH_WINDOW) -> None:
+    """
+    Assign x, y data of all objects from point cloud at once.
+
+    Position is the median of a small window around the object center, so a
+    single invalid pixel does not spoil the estimate. Objects without any
+    valid pixel in the window get NaN coordinates.
+
+    :param objects: list of RigidObject
+    :param pc: Point cloud
+    :param half: half size of the window in px
+    """
+    if not objects:
+        return
+    pc_xz = robust_median(window_samples(objects, pc, half)[..., (0, 2)])
+    for obj, (pc_x, pc_z) in zip(objects, pc_xz):
+        obj.set_position(Point(float(pc_z), float(-pc_x)))
+
+
+def assign_xy_depth(objects: list, depth: np.ndarray, k: np.ndarray,
+                    half: int = DEPTH_WINDOW) -> None:
+    """
+    Assign x, y data of all objects by back-projecting the depth image.
+
+    Only the windows around object centers are read, the same coordinates
+    as from the point cloud are obtained with the pinhole model of k.
+
+    :param objects: list of RigidObject
+    :param depth: depth image, integer in millimeters or float in meters
+    :param k: 3x3 intrinsic matrix of the depth camera
+    :param half: half size of the window in px
+    """
+    if not objects:
+        return
+    samples = window_samples(objects, depth, half).astype(float)
+    if np.issubdtype(depth.dtype, np.integer):
+        samples *= DEPTH_SCALE
+    samples[~(samples > 0)] = np.nan  # zero means no measurement
+    z = robust_median(samples)
+    u = np.array([o.im_position[0] for o in objects], dtype=float)
+    x = (u - k[0, 2]) * z / k[0, 0]
+    for obj, pc_x, pc_z in zip(objects, x, z):
+        obj.set_position(Point(float(pc_z), float(-pc_x)))
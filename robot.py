@@ -1,31 +1,60 @@
 """Robot control module."""
 
 
+import math
 import sys
+import time
+from enum import Enum
 
 import numpy as np
+from acquisition import Frame, FrameGrabber
 from geometry import Point, normalize_angle
 import find_ball
 from mapping import Map, has_all
-from constants import (LINEAR_CORRECTION, ANGULAR_CORRECTION, POSITION_NAMES,
-                       STATE_NAMES, BASE_POSITION, LINEAR_EPSILON,
+from motion import MotionProfile, ProfileShape, tracking_velocity
+from odometry import OdometryBuffer, OdometrySnapshot
+from planning import lookahead_point
+from rigidobject import RigidObject, assign_xy_batch, assign_xy_depth
+from timing import LoopStats
+from constants import (POSITION_NAMES,
+                       STATE_NAMES, BASE_POSITION, CONTROL_RATE,
+                       LINEAR_EPSILON,
                        ANGULAR_EPSILON, MIN_LINEAR_VELOCITY,
                        MAX_LINEAR_VELOCITY, MIN_ANGULAR_VELOCITY,
-                       MAX_ANGULAR_VELOCITY, LINEAR_KP, LINEAR_KD, ANGULAR_KP,
-                       ANGULAR_KD)
+                       MAX_ANGULAR_VELOCITY, MAX_LINEAR_ACCELERATION,
+                       MAX_ANGULAR_ACCELERATION, LINEAR_KP, LINEAR_KD,
+                       ANGULAR_KP, ANGULAR_KD, PATH_LOOKAHEAD,
+                       PATH_GOAL_TOLERANCE, PATH_KP, SCAN_ANGULAR_VELOCITY)
+
+
+class DepthMode(Enum):
+    """Enum of sources of object positions."""
+
+    POINT_CLOUD = 1
+    DEPTH_IMAGE = 2
 
 
 class Robot:
     """Robot object."""
 
     def __init__(self, turtle: any, rate: any,
-                 sleep_func: any = lambda _: None) -> None:
+                 sleep_func: any = lambda _: None,
+                 depth_mode: DepthMode = DepthMode.POINT_CLOUD,
+                 profile_shape: ProfileShape = ProfileShape.TRAPEZOID,
+                 loop_period: float = 1 / CONTROL_RATE,
+                 clock: any = time.monotonic) -> None:
         """
         Create Robot instance.
 
         :param turtle: turtle instance
         :param rate: rate instance
         :param sleep_func: sleep function
+        :param depth_mode: read positions from point cloud or depth image
+        :param profile_shape: velocity profile of go and rotate, None for
+                              plain PD regulation towards the goal
+        :param loop_period: period of rate, deadline of control loops
+        :param clock: function returning current time in seconds, the same
+                      time base as rate (simulation.SimClock)
         """
         self.robot_pos = BASE_POSITION
 
@@ -36,11 +65,27 @@ class Robot:
 
         self.turtle = turtle
         self.rate = rate
+        self.clock = clock
         self.sleep_func = sleep_func
 
+        self.depth_mode = depth_mode
+        self.profile_shape = profile_shape
+        self.loop_period = loop_period
+        self.stats = {}
+        self.odometry = OdometryBuffer()
+        self.depth_k = None
+
+        # background acquisition, see start_acquisition
+        self.grabber = None
+        self.moved_at = -np.inf
+        self.frame_stamp = -np.inf
+
         turtle.register_bumper_event_cb(self.bumper_cb)
         turtle.register_button_event_cb(self.button_cb)
 
+        # build or load color lookup table before the first frame arrives
+        find_ball.get_color_lut()
+
     def __repr__(self) -> str:
         """Return string representation of object."""
         return (f"X: {self.robot_pos.x}, Y: {self.robot_pos.y}, "
@@ -101,8 +146,14 @@ class Robot:
         print(f"{button} button {state}")
         self.button = True
 
-    def check_bumper(self) -> None:
-        """Stop the robot (and its program) if bumped."""
+    def check_bumper(self, tick: OdometrySnapshot = None) -> None:
+        """
+        Stop the robot (and its program) if bumped.
+
+        :param tick: odometry of the current control tick, for logging
+        """
+        if self.bumped and tick is not None:
+            print("Bumped at", tick.pose)
         if self.bumped and self.kick_ball:
             self.turtle.cmd_velocity()
             self.sleep_func(2)
@@ -112,6 +163,53 @@ class Robot:
             self.turtle.cmd_velocity()
             sys.exit(66)
 
+    def loop(self, name: str) -> LoopStats:
+        """
+        Start timing of a control loop.
+
+        :param name: name of the loop, statistics are accumulated by name
+        :return: LoopStats, its sleep replaces rate.sleep in the loop
+        """
+        if name not in self.stats:
+            self.stats[name] = LoopStats(name, self.loop_period,
+                                         self.clock)
+        self.stats[name].begin()
+        return self.stats[name]
+
+    def loop_stats(self) -> dict:
+        """
+        Get timing of control loops since the start of the program.
+
+        :return: dictionary of LoopStats by loop name
+        """
+        return self.stats
+
+    def start_acquisition(self) -> None:
+        """Acquire images and point clouds in the background."""
+        if self.grabber is None:
+            use_pc = self.depth_mode == DepthMode.POINT_CLOUD
+            self.grabber = FrameGrabber(self.turtle, point_cloud=use_pc,
+                                        depth=not use_pc, clock=self.clock)
+        self.grabber.start()
+
+    def stop_acquisition(self) -> None:
+        """Stop background acquisition, images are waited for again."""
+        if self.grabber is not None:
+            self.grabber.stop()
+            self.grabber = None
+
+    def wait_for_frame(self, after: float) -> any:
+        """
+        Get the newest background Frame captured after given time.
+
+        :param after: time from the robot clock
+        :return: Frame or None if the acquisition stopped
+        """
+        frame = self.grabber.wait_newer(max(after, self.frame_stamp))
+        if frame is not None:
+            self.frame_stamp = frame.stamp
+        return frame
+
     def reset(self) -> None:
         """Reset data."""
         self.robot_pos = BASE_POSITION
@@ -140,41 +238,58 @@ class Robot:
         """
         self.robot_pos.add_angle(angle)
 
-    def get_odometry_angle(self, use_correction: bool = True) -> float:
+    def estimate_pose(self, base: Point) -> Point:
         """
-        Angle getter.
+        Estimate position with odometry accumulated since reset in base.
 
-        :param use_correction: boolean for using predefined correction
-        :return: angle
+        :param base: robot position when odometry was reset
+        :return: newly estimated position
         """
-        if use_correction:
-            return self.turtle.get_odometry()[2] * ANGULAR_CORRECTION
-        else:
-            return self.turtle.get_odometry()[2]
+        return self.read_odometry(base).pose
 
-    def get_odometry_x(self, use_correction: bool = True) -> float:
+    def read_odometry(self, base: Point,
+                      use_correction: bool = True) -> OdometrySnapshot:
         """
-        Directional move getter.
+        Read odometry once and record the position into the history.
+
+        Called once per control tick of every move, the snapshot is shared
+        by the regulator, logging and the bumper check.
 
+        :param base: robot position when odometry was reset
         :param use_correction: boolean for using predefined correction
-        :return: x move
+        :return: snapshot of the odometry
         """
-        if use_correction:
-            return self.turtle.get_odometry()[0] * LINEAR_CORRECTION
-        else:
-            return self.turtle.get_odometry()[0]
+        tick = OdometrySnapshot(self.clock(), self.turtle.get_odometry(),
+                                base, use_correction)
+        self.odometry.push(tick.stamp, tick.pose)
+        return tick
 
-    def estimate_position(self) -> Point:
+    def pose_at(self, stamp: float) -> Point:
         """
-        Estimate position with available odometry data.
+        Get robot position at a given time from the odometry history.
 
-        :return: newly estimated position
+        :param stamp: time from the robot clock
+        :return: interpolated position, current position without history
+        """
+        pose = self.odometry.pose_at(stamp)
+        return self.robot_pos if pose is None else pose
+
+    def motion_profile(self, distance: float, set_speed: float,
+                       max_velocity: float,
+                       max_acceleration: float) -> MotionProfile:
         """
-        x, _, angle = self.turtle.get_odometry()
-        return self.robot_pos + Point(x * self.robot_pos.cos,
-                                      x * self.robot_pos.sin,
-                                      normalize_angle(self.robot_pos.angle
-                                                      + angle))
+        Plan velocity profile of a move.
+
+        :param distance: length of the move, non-negative
+        :param set_speed: desired cruise speed, max_velocity if None
+        :param max_velocity: velocity limit
+        :param max_acceleration: acceleration limit
+        :return: MotionProfile, None if profiles are disabled
+        """
+        if self.profile_shape is None:
+            return None
+        return MotionProfile(distance, set_speed or max_velocity,
+                             max_acceleration, self.profile_shape)
 
     def go(self,
            length: float,
@@ -186,8 +301,11 @@ class Robot:
         """
         Directional move with PD regulator.
 
+        With a velocity profile, the regulator tracks the planned position
+        and only corrects the planned velocity.
+
         :param length: directional move length
-        :param set_speed: desired speed
+        :param set_speed: desired (cruise) speed
         :param stop: boolean for hard brake (True) or soft stop (False)
         :param simulate: boolean for virtual setup during debug
         :param use_correction: boolean for using predefined correction
@@ -204,37 +322,64 @@ class Robot:
         # reset robot odometry
         self.reset_odometry()
 
+        profile = self.motion_profile(abs(length), set_speed,
+                                      MAX_LINEAR_VELOCITY,
+                                      MAX_LINEAR_ACCELERATION)
+        if debug_info:
+            print(profile)
+
         # move forward until desired length is hit
-        last_error = 0
+        dir_coef = 1 if length >= 0 else -1
+        start, last_tick, last_error = None, None, 0
+        timer = self.loop("go")
         while True:
-            distance = self.get_odometry_x(use_correction=use_correction)
+            tick = self.read_odometry(self.robot_pos, use_correction)
 
-            error = length - distance
+            error = abs(length) - dir_coef * tick.x
             if abs(error) < LINEAR_EPSILON or self.turtle.is_shutting_down():
                 break
 
             if debug_info:
-                print(f"{self.estimate_position()}")
+                print(tick)
+
+            if start is None:
+                start = tick.stamp
+            if profile is not None:
+                # track the planned position instead of the goal
+                reference, feedforward = profile.state(tick.stamp - start)
+                error = reference - dir_coef * tick.x
+
+            derivative = 0
+            if last_tick is not None and tick.stamp > last_tick.stamp:
+                derivative = (error - last_error) / (tick.stamp -
+                                                     last_tick.stamp)
+            regulator = LINEAR_KP * error + LINEAR_KD * derivative
+            if profile is not None:
+                speed = tracking_velocity(
+                    feedforward, regulator, MIN_LINEAR_VELOCITY,
+                    MAX_LINEAR_VELOCITY,
+                    tick.stamp - start >= profile.duration)
+            else:
+                speed = min(max(regulator, MIN_LINEAR_VELOCITY),
+                            MAX_LINEAR_VELOCITY)
+                if set_speed is not None:
+                    speed = set_speed
 
-            regulator = LINEAR_KP * error + LINEAR_KD * (error - last_error)
-            speed = min(max(regulator, MIN_LINEAR_VELOCITY),
-                        MAX_LINEAR_VELOCITY)
-            if set_speed is not None:
-                speed = set_speed
-
-            self.turtle.cmd_velocity(linear=speed)
-            self.check_bumper()
-            self.rate.sleep()
+            self.turtle.cmd_velocity(linear=dir_coef * speed)
+            self.check_bumper(tick)
+            last_tick, last_error = tick, error
+            timer.sleep(self.rate, tick.stamp)
 
         if stop:
             self.turtle.cmd_velocity()
 
         self.turtle.wait_for_odometry()
-        real_distance = self.get_odometry_x(use_correction=use_correction)
+        real_distance = self.read_odometry(self.robot_pos, use_correction).x
 
         if debug_info:
             print("UPDATING ODOMETRY BY DISTANCE: ", real_distance)
         self.update_odometry_linear(real_distance)
+        self.moved_at = self.clock()
 
     def go_until(self, speed: float = 0.3) -> None:
         """
@@ -257,16 +402,18 @@ class Robot:
         self.kick_ball = True
 
         # move forward until desired length is hit
+        timer = self.loop("kick")
         while True:
-            distance = self.get_odometry_x()
-            if distance > target_distance or self.turtle.is_shutting_down():
+            tick = self.read_odometry(self.robot_pos)
+            if tick.x > target_distance or self.turtle.is_shutting_down():
                 break
-            self.check_bumper()
+            self.check_bumper(tick)
             self.turtle.cmd_velocity(linear=speed)
-            self.rate.sleep()
+            timer.sleep(self.rate, tick.stamp)
 
         self.turtle.cmd_velocity()
         self.kick_ball = False
+        self.moved_at = self.clock()
 
     def rotate(self,
                target_angle: float,
@@ -278,8 +425,11 @@ class Robot:
         """
         Rotational move with PD regulator.
 
+        With a velocity profile, the regulator tracks the planned angle and
+        only corrects the planned velocity.
+
         :param target_angle: rotational move angle
-        :param set_speed: desired speed
+        :param set_speed: desired (cruise) speed
         :param stop: boolean for hard brake (True) or soft stop (False)
         :param simulate: boolean for virtual setup during debug
         :param use_correction: boolean for using predefined correction
@@ -296,41 +446,67 @@ class Robot:
         # reset robot odometry
         self.reset_odometry()
 
+        profile = self.motion_profile(abs(target_angle), set_speed,
+                                      MAX_ANGULAR_VELOCITY,
+                                      MAX_ANGULAR_ACCELERATION)
+        if debug_info:
+            print(profile)
+
         dir_coef = 1 if target_angle >= 0 else -1
-        last_error = 0
+        start, last_tick, last_error = None, None, 0
+        timer = self.loop("rotate")
         while True:
-            angle = self.get_odometry_angle(use_correction=use_correction)
+            tick = self.read_odometry(self.robot_pos, use_correction)
 
-            error = abs(target_angle) - abs(angle)
+            error = abs(target_angle) - dir_coef * tick.angle
             if debug_info:
                 print("ROT ERROR", error)
             if abs(error) < ANGULAR_EPSILON or self.turtle.is_shutting_down():
                 break
 
             if debug_info:
-                print(self.estimate_position())
-
-            regulator = ANGULAR_KP * error + ANGULAR_KD * (error - last_error)
-            speed = min(max(regulator, MIN_ANGULAR_VELOCITY),
-                        MAX_ANGULAR_VELOCITY)
-            if set_speed:
-                speed = set_speed
+                print(tick)
+
+            if start is None:
+                start = tick.stamp
+            if profile is not None:
+                # track the planned angle instead of the goal
+                reference, feedforward = profile.state(tick.stamp - start)
+                error = reference - dir_coef * tick.angle
+
+            derivative = 0
+            if last_tick is not None and tick.stamp > last_tick.stamp:
+                derivative = (error - last_error) / (tick.stamp -
+                                                     last_tick.stamp)
+            regulator = ANGULAR_KP * error + ANGULAR_KD * derivative
+            if profile is not None:
+                speed = tracking_velocity(
+                    feedforward, regulator, MIN_ANGULAR_VELOCITY,
+                    MAX_ANGULAR_VELOCITY,
+                    tick.stamp - start >= profile.duration)
+            else:
+                speed = min(max(regulator, MIN_ANGULAR_VELOCITY),
+                            MAX_ANGULAR_VELOCITY)
+                if set_speed:
+                    speed = set_speed
 
             self.turtle.cmd_velocity(angular=dir_coef * speed)
-            self.check_bumper()
-            self.rate.sleep()
+            self.check_bumper(tick)
+            last_tick, last_error = tick, error
+            timer.sleep(self.rate, tick.stamp)
 
         if stop:
             self.turtle.cmd_velocity()
 
         self.turtle.wait_for_odometry()
-        real_angle = self.get_odometry_angle(use_correction=use_correction)
+        real_angle = self.read_odometry(self.robot_pos, use_correction).angle
 
         if debug_info:
             print("UPDATING ODOMETRY BY ANGLE: ",
                   real_angle, "FINAL ERROR:",
                   target_angle - real_angle)
         self.update_odometry_angular(real_angle)
+        self.moved_at = self.clock()
 
     def rotate_until(self, speed: float = 0.5) -> None:
         """
@@ -396,34 +572,149 @@ class Robot:
             input("PRESS ANY KEY...")
         self.turn(turn_end, debug_info=debug_info)
 
-    def get_objects_from_camera(self, debug_info: bool = False) -> list:
+    def follow_path(self,
+                    path: list,
+                    lookahead: float = PATH_LOOKAHEAD,
+                    speed: float = MAX_LINEAR_VELOCITY,
+                    debug_info: bool = False) -> None:
         """
-        Save all visible objects.
+        Follow the whole route in one control loop with pure pursuit.
+
+        Linear and angular velocity are commanded together, the robot turns
+        to the angle of the last position only at the goal.
 
+        :param path: list of positions along the route, starting with robot
+        :param lookahead: distance of the followed point along the route
+        :param speed: maximal move speed
         :param debug_info: boolean for debug
-        :return: list of all visible objects
         """
-        # wait for rgb image
+        if len(path) < 2:
+            return
+        goal = path[-1]
+
+        # face the route first, pure pursuit turns only while moving
+        target, _ = lookahead_point(path, 0, self.robot_pos, lookahead)
+        turn_start = normalize_angle(self.robot_pos.relative_angle(target) -
+                                     self.robot_pos.angle)
+        if abs(turn_start) > np.pi / 4:
+            self.turn(turn_start, debug_info=debug_info)
+
+        self.reset_odometry()
+        base = self.robot_pos
+        segment = 0
+        timer = self.loop("follow_path")
+        while not self.turtle.is_shutting_down():
+            tick = self.read_odometry(base)
+            pose = tick.pose
+            to_goal = pose.distance(goal)
+            if to_goal < PATH_GOAL_TOLERANCE:
+                break
+
+            target, segment = lookahead_point(path, segment, pose, lookahead)
+            alpha = normalize_angle(pose.relative_angle(target) - pose.angle)
+            if debug_info:
+                print(f"{pose} -> {target}, ALPHA: {alpha}")
+
+            if abs(alpha) > np.pi / 2:
+                # target is behind, turn on the spot
+                linear = 0
+                angular = math.copysign(MAX_ANGULAR_VELOCITY, alpha)
+            else:
+                curvature = 2 * math.sin(alpha) / max(pose.distance(target),
+                                                      PATH_GOAL_TOLERANCE)
+                linear = min(max(PATH_KP * to_goal, MIN_LINEAR_VELOCITY),
+                             speed)
+                angular = linear * curvature
+                if abs(angular) > MAX_ANGULAR_VELOCITY:
+                    # keep the curvature, slow down instead
+                    angular = math.copysign(MAX_ANGULAR_VELOCITY, angular)
+                    linear = angular / curvature
+
+            self.turtle.cmd_velocity(linear=linear, angular=angular)
+            self.check_bumper(tick)
+            timer.sleep(self.rate, tick.stamp)
+
+        self.turtle.cmd_velocity()
+        self.turtle.wait_for_odometry()
+        self.robot_pos = self.estimate_pose(base)
+        self.moved_at = self.clock()
+        if debug_info:
+            print("PATH FINISHED AT", self.robot_pos)
+
+        self.turn(normalize_angle(goal.angle - self.robot_pos.angle),
+                  debug_info=debug_info)
+
+    def capture(self, after: float) -> Frame:
+        """
+        Get a new camera Frame.
+
+        Without background acquisition only the RGB image is read, depth data
+        is waited for by locate_objects when there is any object.
+
+        :param after: with background acquisition, the Frame has to be
+            captured after this time of the robot clock
+        :return: Frame or None if the acquisition stopped
+        """
+        if self.grabber is not None:
+            return self.wait_for_frame(after)
+        # closer to the exposure than after the wait, but an image delayed
+        # in transport may still be older than the stamp
+        stamp = self.clock()
         self.turtle.wait_for_rgb_image()
-        rgb_img = self.turtle.get_rgb_image()
-        all_objects = find_ball.find_objects(rgb_img)
+        self.frame_stamp = stamp
+        return Frame(stamp, self.turtle.get_rgb_image(), None)
+
+    def locate_objects(self, frame: Frame, debug_info: bool = False) -> list:
+        """
+        Find all objects in the frame and assign their positions.
+
+        :param frame: captured Frame
+        :param debug_info: boolean for debug
+        :return: list of all visible objects with valid positions
+        """
+        all_objects = find_ball.find_objects(frame.rgb)
         # wait for point cloud find position of each object
         if debug_info:
-            find_ball.show_objects(rgb_img, all_objects, "Objects", True)
+            find_ball.show_objects(frame.rgb, all_objects, "Objects", True)
         if not all_objects:
             return all_objects
-        self.turtle.wait_for_point_cloud()
-        pc = self.turtle.get_point_cloud()
-        for o in all_objects:
-            o.assign_xy(pc)
-        return all_objects
+        if self.depth_mode == DepthMode.POINT_CLOUD:
+            pc = frame.pc
+            if pc is None:
+                self.turtle.wait_for_point_cloud()
+                pc = self.turtle.get_point_cloud()
+            assign_xy_batch(all_objects, pc)
+        else:
+            depth = frame.depth
+            if depth is None:
+                self.turtle.wait_for_depth_image()
+                depth = self.turtle.get_depth_image()
+            if self.depth_k is None:
+                self.depth_k = np.asarray(self.turtle.get_depth_K())
+            assign_xy_depth(all_objects, depth, self.depth_k)
+        # drop objects without any valid depth around their center
+        return [o for o in all_objects if o.is_valid()]
+
+    def get_objects_from_camera(self, debug_info: bool = False) -> list:
+        """
+        Save all visible objects.
+
+        :param debug_info: boolean for debug
+        :return: list of all visible objects
+        """
+        # newest frame captured when the robot was not moving
+        frame = self.capture(self.moved_at)
+        if frame is None:
+            return []
+        return self.locate_objects(frame, debug_info)
 
     def scan_environment(self,
                          robot_map: Map,
                          max_angle: float = 2 * np.pi,
                          big: float = np.pi / 6,
                          small: float = np.pi / 8,
-                         debug_info: bool = False) -> bool:
+                         debug_info: bool = False,
+                         continuous: bool = False) -> bool:
         """
         Scan objects around 360 ° or until or expected objects are found.
 
@@ -432,8 +723,12 @@ class Robot:
         :param big: angle to rotate if there are no objects on the camera
         :param small: angle to rotate if there are some objects on the camera
         :param debug_info: boolean for debug
+        :param continuous: scan while rotating, see scan_rotating
         :return: list of all seen objects during the scan
         """
+        if continuous:
+            return self.scan_rotating(robot_map, max_angle,
+                                      debug_info=debug_info)
         angle = 0
         while angle < max_angle and not self.turtle.is_shutting_down():
             if debug_info:
@@ -449,12 +744,9 @@ class Robot:
 
             if debug_info:
                 print("ALL OBJECTS:", objects)
-            for obj in objects:
-                robot_pos = self.position
-                robot_angle = self.angle
-                if debug_info:
-                    print("ROBOT POSITION:", robot_pos, robot_angle)
-                robot_map.add_object(obj, robot_pos, debug_info)
+            if debug_info:
+                print("ROBOT POSITION:", self.position, self.angle)
+            robot_map.add_objects(objects, self.position, debug_info)
             if debug_info:
                 print("\tSHOWING OBJECT")
 
@@ -467,6 +759,85 @@ class Robot:
 
         return False
 
+    def track_ball(self, last_ball: RigidObject = None,
+                   shift: int = 0) -> RigidObject:
+        """
+        Find only the ball in a new image, no point cloud is used.
+
+        Search in the window predicted from last_ball first and fall back to
+        the whole image when the ball is lost.
+
+        :param last_ball: ball from the previous frame
+        :param shift: horizontal move of the ball between last two frames
+        :return: ball or None
+        """
+        frame = self.capture(self.frame_stamp)
+        if frame is None:
+            return None
+        rgb_img = frame.rgb
+        found = []
+        if last_ball is not None:
+            window = find_ball.ball_window(last_ball, shift, rgb_img.shape)
+            find_ball.find_ball(rgb_img, found, window=window)
+        if not found:
+            find_ball.find_ball(rgb_img, found)
+        return found[0] if found else None
+
+    def scan_rotating(self,
+                      robot_map: Map,
+                      max_angle: float = 2 * np.pi,
+                      speed: float = SCAN_ANGULAR_VELOCITY,
+                      debug_info: bool = False) -> bool:
+        """
+        Scan objects while rotating at a constant speed.
+
+        Every frame is processed as it arrives, its objects are added to the
+        map from the robot position at the capture time, see pose_at.
+
+        :param robot_map: Map with internal data
+        :param max_angle: 2pi for full rotation
+        :param speed: angular speed of the rotation
+        :param debug_info: boolean for debug
+        :return: boolean, True if all expected objects were found
+        """
+        self.reset_odometry()
+        base = self.robot_pos
+        last_stamp = self.clock()
+        self.odometry.push(last_stamp, base)
+        angle = 0
+        found = False
+        timer = self.loop("scan_rotating")
+        while (abs(angle) < max_angle and not found and
+               not self.turtle.is_shutting_down()):
+            self.turtle.cmd_velocity(angular=speed)
+            last_angle = self.odometry.latest()[1].angle
+            tick = self.read_odometry(base)
+            angle += normalize_angle(tick.pose.angle - last_angle)
+
+            if self.grabber is not None:
+                frame = self.grabber.latest()
+            else:
+                frame = self.capture(last_stamp)
+            if frame is not None and frame.stamp > last_stamp:
+                last_stamp = frame.stamp
+                objects = self.locate_objects(frame)
+                if objects:
+                    frame_pos = self.pose_at(frame.stamp)
+                    if debug_info:
+                        print("ALL OBJECTS:", objects, "FROM", frame_pos)
+                    robot_map.add_objects(objects, frame_pos, debug_info,
+                                          stamp=frame.stamp)
+                    found = robot_map.has_all or has_all(objects)
+
+            self.check_bumper(tick)
+            timer.sleep(self.rate, tick.stamp)
+
+        self.turtle.cmd_velocity()
+        self.turtle.wait_for_odometry()
+        self.robot_pos = self.estimate_pose(base)
+        self.moved_at = self.clock()
+        return found
+
     def center_ball(self,
                     center: int = 350,
                     offset: int = 10,
@@ -478,18 +849,21 @@ class Robot:
         :param offset: offset of the camera in px
         :param debug_info: boolean for debug
         """
+        tracked = None
+        shift = 0
+        timer = self.loop("center_ball")
         while not self.turtle.is_shutting_down():
-            all_objects_ = self.get_objects_from_camera()
-            ball = list(filter(lambda x: x.o_type ==
-                               find_ball.RigidType.BALL, all_objects_))
-
-            if ball:
-                if debug_info:
-                    print("---------\n", ball)
-                ball = ball[0]
-            else:
+            ball = self.track_ball(tracked, shift)
+            if ball is None:
+                tracked, shift = None, 0
                 self.turtle.cmd_velocity(angular=0.5)
+                timer.sleep(self.rate, self.frame_stamp)
                 continue
+            if debug_info:
+                print("---------\n", ball)
+            if tracked is not None:
+                shift = ball.im_p.x - tracked.im_p.x
+            tracked = ball
 
             if center - offset <= ball.im_p.x <= center + offset:
                 break
@@ -502,7 +876,7 @@ class Robot:
                     print("LEFT-> SPEED: ", 0.4)
                 self.turtle.cmd_velocity(angular=0.4)
 
-            self.rate.sleep()
+            timer.sleep(self.rate, self.frame_stamp)
 
 
 # positive angle -> left
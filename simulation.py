@@ -0,0 +1,498 @@
+"""
+Kinematic Turtlebot simulator, a drop-in turtle for Robot.
+
+Time is virtual, SimClock advances only when the program sleeps with
+SimRate or waits for sensors, so missions run faster than real time.
+Background acquisition (Robot.start_acquisition) is not supported.
+"""
+
+
+import math
+from types import SimpleNamespace
+
+import numpy as np
+from geometry import Point, normalize_angle
+from rigidobject import ColorType, RigidType, RADIUS_BALL, RADIUS_POLE
+from constants import BASE_POSITION, LINEAR_CORRECTION, ANGULAR_CORRECTION
+
+
+IMAGE_SHAPE = (480, 640)
+CAMERA_K = np.array(((570.3, 0, 319.5), (0, 570.3, 239.5), (0, 0, 1)))
+CAMERA_HEIGHT = 0.25
+CAMERA_RATE = 30
+ODOMETRY_RATE = 50
+FLOOR_RANGE = 6
+
+SIM_STEP = 0.005
+SIM_LINEAR_ACCELERATION = 1
+SIM_ANGULAR_ACCELERATION = 4
+ROBOT_RADIUS = 0.18
+POLE_HEIGHT = 0.5
+
+# BGR colors inside the HSV bounds of find_ball
+SIM_COLORS = {
+    ColorType.YELLOW: (30, 188, 220),  # HSV (25, 220, 220)
+    ColorType.BLUE: (150, 107, 21),  # HSV (100, 220, 150)
+    ColorType.GREEN: (62, 150, 62),  # HSV (60, 150, 150)
+    ColorType.RED: (27, 56, 200),  # HSV (5, 220, 200)
+}
+FLOOR_COLOR = (110, 110, 110)
+WALL_COLOR = (180, 180, 180)
+
+
+class SimClock:
+    """Virtual time shared by the simulated turtle, rate and robot."""
+
+    def __init__(self) -> None:
+        """Create SimClock instance."""
+        self.now = 0.0
+        self.listeners = []
+
+    def __call__(self) -> float:
+        """Return current virtual time, used as clock of Robot."""
+        return self.now
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"SimClock at {self.now:.3f} s"
+
+    def advance_to(self, t: float) -> None:
+        """
+        Move time forward and let listeners catch up.
+
+        :param t: new time, earlier times are ignored
+        """
+        if t <= self.now:
+            return
+        self.now = t
+        for listener in self.listeners:
+            listener(t)
+
+    def sleep(self, duration: float) -> None:
+        """
+        Sleep in virtual time, replaces sleep of robolab_turtlebot.
+
+        :param duration: time in seconds
+        """
+        self.advance_to(self.now + duration)
+
+
+class SimRate:
+    """Virtual replacement of Rate."""
+
+    def __init__(self, clock: SimClock, hz: float) -> None:
+        """
+        Create SimRate instance.
+
+        :param clock: virtual clock
+        :param hz: frequency of the loop
+        """
+        self.clock = clock
+        self.period = 1 / hz
+        self.last = clock.now
+
+    def sleep(self) -> None:
+        """Sleep until the next deadline, or not at all when it has passed."""
+        deadline = self.last + self.period
+        self.clock.advance_to(deadline)
+        self.last = max(deadline, self.clock.now)
+
+
+class SimObject:
+    """Colored pole (vertical cylinder) or ball (sphere) on the floor."""
+
+    def __init__(self, x: float, y: float, o_type: RigidType,
+                 c_type: ColorType) -> None:
+        """
+        Create SimObject instance.
+
+        :param x: x world coordinate of the center
+        :param y: y world coordinate of the center
+        :param o_type: type of object
+        :param c_type: color of object
+        """
+        self.p = Point(x, y)
+        self.o_type = o_type
+        self.c_type = c_type
+        self.r = RADIUS_BALL if o_type == RigidType.BALL else RADIUS_POLE
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"{self.c_type.name} {self.o_type.name} at {self.p}"
+
+
+def default_scene() -> list:
+    """
+    Create the scene of the assignment, ball in front of a goal.
+
+    :return: list of SimObject
+    """
+    return [SimObject(0.4, 1.2, RigidType.BALL, ColorType.YELLOW),
+            SimObject(-0.35, 2.6, RigidType.POLE, ColorType.BLUE),
+            SimObject(0.35, 2.6, RigidType.POLE, ColorType.BLUE),
+            SimObject(-1.2, 1.0, RigidType.OBST, ColorType.RED)]
+
+
+def next_tick(now: float, period: float) -> float:
+    """
+    Get time of the next periodic sensor message.
+
+    :param now: current time
+    :param period: period of the messages
+    :return: the first multiple of period after now
+    """
+    # a message exactly at now (up to rounding) has already arrived
+    return (math.floor(now / period + 1e-6) + 1) * period
+
+
+class SimCamera:
+    """
+    Ray casting camera looking forward from the robot.
+
+    Images follow the Turtlebot conventions: BGR image, depth in millimeters
+    (0 for no measurement) and point cloud in camera coordinates (x right,
+    y down, z forward, NaN for no measurement). The floor and the wall are
+    the same in every frame and are prepared once.
+    """
+
+    def __init__(self, k: np.ndarray = CAMERA_K, shape: tuple = IMAGE_SHAPE,
+                 height: float = CAMERA_HEIGHT) -> None:
+        """
+        Create SimCamera instance.
+
+        :param k: 3x3 intrinsic matrix
+        :param shape: height and width of images
+        :param height: height of the camera above the floor
+        """
+        self.k = k
+        self.shape = shape
+        self.height = height
+        # ray directions with unit z of columns and rows
+        self.dx = (np.arange(shape[1]) - k[0, 2]) / k[0, 0]
+        self.dy = (np.arange(shape[0]) - k[1, 2]) / k[1, 1]
+
+        # floor below the horizon, wall without depth above it
+        self.floor = np.full(shape, np.inf)
+        below = self.dy > 0
+        self.floor[below] = height / self.dy[below, None]
+        self.floor[self.floor > FLOOR_RANGE] = np.inf
+        self.background = np.empty(shape + (3,), dtype=np.uint8)
+        self.background[:] = WALL_COLOR
+        self.background[np.isfinite(self.floor)] = FLOOR_COLOR
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"SimCamera {self.shape[1]}x{self.shape[0]}"
+
+    @staticmethod
+    def first_hit(d: np.ndarray, cx: float, cz: float,
+                  r: float) -> np.ndarray:
+        """
+        Intersect planar rays t * (d, 1) with a circle.
+
+        :param d: ray directions across z
+        :param cx: center coordinate across z
+        :param cz: z coordinate of the center
+        :param r: radius
+        :return: z of the nearer intersection, inf for no intersection
+        """
+        a = d * d + 1
+        half_b = d * cx + cz
+        disc = half_b * half_b - a * (cx * cx + cz * cz - r * r)
+        t = np.full(np.shape(disc), np.inf)
+        hit = disc >= 0
+        t[hit] = (half_b[hit] - np.sqrt(disc[hit])) / a[hit]
+        return t
+
+    def render(self, pose: Point, objects: list) -> tuple:
+        """
+        Ray cast the scene from a robot position.
+
+        Every object is intersected only within its projected bounding box.
+
+        :param pose: robot position
+        :param objects: list of SimObject
+        :return: BGR image, depth image and point cloud
+        """
+        z = self.floor.copy()
+        bgr = self.background.copy()
+        for obj in objects:
+            # object center in camera coordinates
+            ox, oy = obj.p.x - pose.x, obj.p.y - pose.y
+            cz = ox * pose.cos + oy * pose.sin
+            cx = ox * pose.sin - oy * pose.cos
+            if cz <= obj.r:
+                continue
+            cols = np.flatnonzero(np.isfinite(
+                self.first_hit(self.dx, cx, cz, obj.r)))
+            if not len(cols):
+                continue
+            cols = slice(cols[0], cols[-1] + 1)
+            dx = self.dx[cols]
+            if obj.o_type == RigidType.BALL:
+                cy = self.height - obj.r
+                rows = np.flatnonzero(np.isfinite(
+                    self.first_hit(self.dy, cy, cz, obj.r)))
+                if not len(rows):
+                    continue
+                rows = slice(rows[0], rows[-1] + 1)
+                dy = self.dy[rows]
+                # sphere, the same quadratic equation in three dimensions
+                a = dx[None, :] ** 2 + dy[:, None] ** 2 + 1
+                half_b = dx[None, :] * cx + dy[:, None] * cy + cz
+                disc = half_b * half_b - a * (cx * cx + cy * cy + cz * cz -
+                                              obj.r * obj.r)
+                t = np.full(disc.shape, np.inf)
+                hit = disc >= 0
+                t[hit] = (half_b[hit] - np.sqrt(disc[hit])) / a[hit]
+            else:
+                # vertical cylinder, column-wise intersection and height test
+                rows = slice(None)
+                column = self.first_hit(dx, cx, cz, obj.r)
+                height = self.height - self.dy[:, None] * column
+                t = np.where((height < 0) | (height > POLE_HEIGHT), np.inf,
+                             column)
+            window = z[rows, cols]
+            closer = t < window
+            window[closer] = t[closer]
+            bgr[rows, cols][closer] = SIM_COLORS[obj.c_type]
+
+        valid = np.isfinite(z)
+        depth = np.where(valid, np.round(z * 1000), 0).astype(np.uint16)
+        pc = np.empty(self.shape + (3,))
+        np.multiply(self.dx[None, :], z, out=pc[..., 0])
+        np.multiply(self.dy[:, None], z, out=pc[..., 1])
+        pc[..., 2] = z
+        pc[~valid] = np.nan
+        return bgr, depth, pc
+
+
+class SimTurtle:
+    """
+    Simulated Turtlebot with the interface of robolab_turtlebot.
+
+    Differential drive kinematics with acceleration limits are integrated
+    in steps of SIM_STEP whenever the clock advances. Odometry is exact but
+    scaled inversely to the corrections of Robot, bumping into an object
+    fires the bumper callback and stops the robot.
+    """
+
+    def __init__(self, clock: SimClock, objects: list = None,
+                 pose: Point = BASE_POSITION, camera: SimCamera = None,
+                 noise: float = 0, button_at: float = 0.5,
+                 duration: float = np.inf, seed: int = 0) -> None:
+        """
+        Create SimTurtle instance.
+
+        :param clock: virtual clock
+        :param objects: list of SimObject, default_scene by default
+        :param pose: initial robot position
+        :param camera: SimCamera, default camera by default
+        :param noise: standard deviation of image noise in intensity levels
+        :param button_at: time of pressing the button (once its callback is
+                          registered), None for never
+        :param duration: time of the shutdown
+        :param seed: random seed of the noise
+        """
+        self.clock = clock
+        self.objects = default_scene() if objects is None else objects
+        self.pose = Point(pose.x, pose.y, pose.angle)
+        self.odometry_base = self.pose
+        self.camera = SimCamera() if camera is None else camera
+        self.noise = noise
+        self.button_at = button_at
+        self.duration = duration
+        self.rng = np.random.default_rng(seed)
+
+        self.time = clock.now
+        self.command = (0.0, 0.0)
+        self.velocity = (0.0, 0.0)
+        self.bumper_cb = None
+        self.button_cb = None
+        self.bumped = False
+        self.frame_time = None
+        self.frame_pose = None
+        self.frame = None
+        self.sounds = []
+        clock.listeners.append(self.update)
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        return f"SimTurtle at {self.pose}, {self.clock}"
+
+    def update(self, now: float) -> None:
+        """
+        Integrate the motion up to now.
+
+        :param now: current time of the clock
+        """
+        while self.time < now:
+            dt = min(SIM_STEP, now - self.time)
+            self.time += dt
+            self.step(dt)
+        if (self.button_at is not None and now >= self.button_at and
+                self.button_cb is not None):
+            self.button_at = None
+            self.button_cb(SimpleNamespace(button=0, state=1))
+
+    def step(self, dt: float) -> None:
+        """
+        Integrate one step of differential drive kinematics.
+
+        :param dt: length of the step
+        """
+        v, w = self.velocity
+        cmd_v, cmd_w = self.command
+        dv = SIM_LINEAR_ACCELERATION * dt
+        dw = SIM_ANGULAR_ACCELERATION * dt
+        v_new = min(max(cmd_v, v - dv), v + dv)
+        w_new = min(max(cmd_w, w - dw), w + dw)
+        v_mean, w_mean = (v + v_new) / 2, (w + w_new) / 2
+        heading = self.pose.angle + w_mean * dt / 2
+        new_pose = Point(self.pose.x + v_mean * dt * math.cos(heading),
+                         self.pose.y + v_mean * dt * math.sin(heading),
+                         self.pose.angle + w_mean * dt)
+        for obj in self.objects:
+            if new_pose.distance(obj.p) < ROBOT_RADIUS + obj.r:
+                self.velocity = (0.0, 0.0)
+                if not self.bumped:
+                    self.bumped = True
+                    if self.bumper_cb is not None:
+                        self.bumper_cb(SimpleNamespace(bumper=1, state=1))
+                return
+        self.pose = new_pose
+        self.velocity = (v_new, w_new)
+
+    def register_bumper_event_cb(self, cb: any) -> None:
+        """
+        Register bumper callback.
+
+        :param cb: function called with message of bumper and state
+        """
+        self.bumper_cb = cb
+
+    def register_button_event_cb(self, cb: any) -> None:
+        """
+        Register button callback.
+
+        :param cb: function called with message of button and state
+        """
+        self.button_cb = cb
+
+    def is_shutting_down(self) -> bool:
+        """
+        Decide whether the simulation has ended.
+
+        :return: boolean
+        """
+        return self.clock.now >= self.duration
+
+    def cmd_velocity(self, linear: float = 0, angular: float = 0) -> None:
+        """
+        Command velocity of the robot, held until the next command.
+
+        :param linear: linear velocity in m/s
+        :param angular: angular velocity in rad/s
+        """
+        self.command = (float(linear), float(angular))
+
+    def play_sound(self, sound_id: int = 0) -> None:
+        """
+        Record a played sound.
+
+        :param sound_id: id of the sound
+        """
+        self.sounds.append((self.clock.now, sound_id))
+
+    def reset_odometry(self) -> None:
+        """Start odometry from the current position."""
+        self.odometry_base = self.pose
+
+    def wait_for_odometry(self) -> None:
+        """Wait for the next odometry message."""
+        self.clock.advance_to(next_tick(self.clock.now, 1 / ODOMETRY_RATE))
+
+    def get_odometry(self) -> tuple:
+        """
+        Get odometry since the last reset.
+
+        :return: x, y, angle in the frame of the reset position
+        """
+        base = self.odometry_base
+        ox, oy = self.pose.x - base.x, self.pose.y - base.y
+        x = ox * base.cos + oy * base.sin
+        y = -ox * base.sin + oy * base.cos
+        angle = normalize_angle(self.pose.angle - base.angle)
+        return (x / LINEAR_CORRECTION, y / LINEAR_CORRECTION,
+                angle / ANGULAR_CORRECTION)
+
+    def wait_for_rgb_image(self) -> None:
+        """Wait for the next camera frame."""
+        self.clock.advance_to(next_tick(self.clock.now, 1 / CAMERA_RATE))
+        self.frame_time = self.clock.now
+        self.frame_pose = self.pose
+        self.frame = None
+
+    def wait_for_point_cloud(self) -> None:
+        """Point cloud is captured with the image."""
+        if self.frame_time is None:
+            self.wait_for_rgb_image()
+
+    def wait_for_depth_image(self) -> None:
+        """Depth image is captured with the image."""
+        self.wait_for_point_cloud()
+
+    def capture(self) -> tuple:
+        """
+        Render the last waited for frame once.
+
+        :return: BGR image, depth image and point cloud
+        """
+        if self.frame is None:
+            pose = self.pose if self.frame_pose is None else self.frame_pose
+            bgr, depth, pc = self.camera.render(pose, self.objects)
+            if self.noise:
+                noisy = bgr + self.rng.normal(0, self.noise, bgr.shape)
+                bgr = np.clip(noisy, 0, 255).astype(np.uint8)
+            self.frame = (bgr, depth, pc)
+        return self.frame
+
+    def get_rgb_image(self) -> np.ndarray:
+        """
+        Get image of the current frame.
+
+        :return: BGR image
+        """
+        return self.capture()[0]
+
+    def get_depth_image(self) -> np.ndarray:
+        """
+        Get depth image of the current frame.
+
+        :return: depth in millimeters
+        """
+        return self.capture()[1]
+
+    def get_point_cloud(self) -> np.ndarray:
+        """
+        Get point cloud of the current frame.
+
+        :return: points in camera coordinates
+        """
+        return self.capture()[2]
+
+    def get_rgb_K(self) -> np.ndarray:
+        """
+        Get intrinsic matrix of the RGB camera.
+
+        :return: 3x3 matrix
+        """
+        return self.camera.k
+
+    def get_depth_K(self) -> np.ndarray:
+        """
+        Get intrinsic matrix of the depth camera, registered to RGB.
+
+        :return: 3x3 matrix
+        """
+        return self.camera.k
@@ -0,0 +1,55 @@
+"""Grid hash clustering against the greedy reference."""
+
+
+from clustering import GreedyClusters, GridClusters
+from geometry import Point
+import numpy as np
+import pytest
+from rigidobject import RigidObject, RigidType
+
+
+THRESHOLD = 0.2
+
+
+def cluster(backend: type, xy: np.ndarray) -> GreedyClusters:
+    """
+    Add points to a new backend one by one.
+
+    :param backend: class of the clustering backend
+    :param xy: positions, shape (n, 2)
+    :return: the filled backend
+    """
+    clusters = backend(THRESHOLD)
+    for x, y in xy:
+        obj = RigidObject(0, 0, 0, 0, RigidType.POLE)
+        obj.set_position(Point(float(x), float(y)))
+        clusters.add(obj)
+    return clusters
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_grid_equals_greedy(seed: int) -> None:
+    """Both backends produce the same clusters in the same order."""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(-3, 3, (40, 2))
+    xy = (centers[rng.integers(0, len(centers), 800)] +
+          rng.normal(0, 0.08, (800, 2)))
+    greedy = cluster(GreedyClusters, xy)
+    grid = cluster(GridClusters, xy)
+    assert grid.counter == greedy.counter
+    np.testing.assert_array_equal([o.xy for o in grid.objects],
+                                  [o.xy for o in greedy.objects])
+
+
+def test_grid_at_cell_borders() -> None:
+    """Points close across cell borders and on them are merged."""
+    eps = 1e-9
+    xy = np.array([(THRESHOLD - eps, 0.0), (THRESHOLD + eps, 0.0),
+                   (-eps, -eps), (eps, eps), (2 * THRESHOLD, THRESHOLD),
+                   (2 * THRESHOLD - 0.15, THRESHOLD + 0.1),
+                   (-THRESHOLD, -THRESHOLD), (-0.05, -0.05)])
+    greedy = cluster(GreedyClusters, xy)
+    grid = cluster(GridClusters, xy)
+    assert grid.counter == greedy.counter
+    np.testing.assert_array_equal([o.xy for o in grid.objects],
+                                  [o.xy for o in greedy.objects])
@@ -0,0 +1,54 @@
+"""Lookup table segmentation against thresholding by cv2.inRange."""
+
+
+import glob
+import os
+
+import cv2
+from find_ball import COLOR_BOUNDS, label_mask, segment
+import numpy as np
+import pytest
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), "test_data")
+
+
+def random_image(seed: int) -> np.ndarray:
+    """
+    Create an image of random colors.
+
+    :param seed: seed of the generator
+    :return: BGR image
+    """
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)
+
+
+def images() -> list:
+    """
+    Get test images and random images.
+
+    :return: list of BGR images
+    """
+    found = [cv2.imread(path) for path in
+             sorted(glob.glob(os.path.join(DATA_DIR, "*.png")))]
+    return [img for img in found if img is not None] + [random_image(0)]
+
+
+@pytest.mark.parametrize("image", images())
+def test_segment_matches_in_range(image: np.ndarray) -> None:
+    """Every label mask equals the mask of its bound by cv2.inRange."""
+    labels = segment(image)
+    hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+    for label, bound in enumerate(COLOR_BOUNDS, start=1):
+        expected = cv2.inRange(hsv, bound.lb, bound.ub)
+        np.testing.assert_array_equal(label_mask(labels, label), expected)
+
+
+def test_segment_of_non_contiguous_image() -> None:
+    """Views of an image are classified like a copy."""
+    image = random_image(1)
+    view = image[::2, 1::3]
+    np.testing.assert_array_equal(segment(view),
+                                  segment(np.ascontiguousarray(view)))
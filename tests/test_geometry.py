@@ -0,0 +1,34 @@
+"""Items of PointArray and SegmentArray as views of the arrays."""
+
+
+from geometry import Point, PointArray, SegmentArray
+import numpy as np
+
+
+def test_point_array_item_is_view():
+    """Setting x or y of an item writes the array and vice versa."""
+    points = PointArray([(0, 1), (2, 3)])
+    point = points[1]
+    assert (point.x, point.y) == (2.0, 3.0)
+    point.x = 5
+    points[-1].y += 1
+    assert np.array_equal(points.xy, [(0, 1), (5, 4)])
+    points.xy[0] = (7, 8)
+    assert points[0].xy.tolist() == [7.0, 8.0]
+
+
+def test_point_view_arithmetic_returns_point():
+    """Arithmetic on an item creates a plain Point detached from the array."""
+    points = PointArray([(1, 2)])
+    moved = points[0] + Point(1, 1)
+    moved.x = 0
+    assert type(moved) is Point
+    assert np.array_equal(points.xy, [(1, 2)])
+
+
+def test_segment_array_item_shares_points():
+    """Endpoints of a segment item are views of the endpoint arrays."""
+    segments = SegmentArray.from_route([Point(0, 0), Point(1, 0),
+                                        Point(1, 1)])
+    segments[1].b.y = 2
+    assert np.array_equal(segments.b.xy, [(1, 0), (1, 2)])
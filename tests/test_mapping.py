@@ -0,0 +1,128 @@
+"""Incremental merging of Map against merging all observations at once."""
+
+
+from clustering import ClusterMode
+from geometry import Point
+from mapping import Map
+import numpy as np
+import pytest
+from rigidobject import RigidObject, RigidType
+
+
+THRESHOLD = 0.2
+
+
+def observations(count: int, seed: int) -> list:
+    """
+    Create noisy repeated observations of a few objects.
+
+    :param count: number of observations
+    :param seed: random seed
+    :return: list of RigidObject with positions relative to the robot
+    """
+    rng = np.random.default_rng(seed)
+    true_xy = rng.uniform(-2, 2, (8, 2))
+    picked = rng.integers(0, len(true_xy), count)
+    objects = []
+    for k, (x, y) in zip(picked, true_xy[picked] +
+                         rng.normal(0, 0.05, (count, 2))):
+        obj = RigidObject(0, 0, 0, 0, RigidType(int(k) % len(RigidType) + 1))
+        obj.set_position(Point(float(x), float(y)))
+        objects.append(obj)
+    return objects
+
+
+def full_merge(objects: list) -> dict:
+    """
+    Merge all observations at once as merge_objects did before.
+
+    :param objects: observations in the order they were added
+    :return: positions and counters of merged objects by type
+    """
+    merged = {}
+    for o_type in RigidType:
+        xy, counter = [], []
+        for obj in objects:
+            if obj.o_type != o_type:
+                continue
+            is_merged = False
+            for k, m in enumerate(xy):
+                if np.linalg.norm(obj.xy - m) < THRESHOLD:
+                    xy[k] = np.mean([m, obj.xy], axis=0)
+                    counter[k] += 1
+                    is_merged = True
+            if not is_merged:
+                xy.append(np.array(obj.xy, dtype=float))
+                counter.append(1)
+        merged[o_type] = (xy, counter)
+    return merged
+
+
+def positions(objects: list) -> np.ndarray:
+    """
+    Get positions of objects.
+
+    :param objects: list of RigidObject
+    :return: array of shape (n, 2)
+    """
+    return np.reshape([o.xy for o in objects], (-1, 2))
+
+
+def assert_same(world_map: Map, objects: list) -> None:
+    """
+    Check merged objects of world_map against full_merge.
+
+    :param world_map: map with all objects added
+    :param objects: observations in the order they were added
+    """
+    expected = full_merge(objects)
+    merged, counts = world_map.merge_objects()
+    for o_type, (xy, counter) in expected.items():
+        assert counts[o_type] == counter
+        order = sorted(range(len(counter)), key=lambda k: counter[k],
+                       reverse=True)
+        np.testing.assert_allclose(positions(merged[o_type]),
+                                   np.reshape([xy[k] for k in order],
+                                              (-1, 2)))
+
+
+@pytest.mark.parametrize("mode", list(ClusterMode))
+def test_incremental_equals_full_merge(mode: ClusterMode) -> None:
+    """Queries between additions do not change the merged objects."""
+    objects = observations(300, 0)
+    world_map = Map(THRESHOLD, cluster_mode=mode)
+    for i, obj in enumerate(objects):
+        world_map.add_object(obj.copy(), Point(0, 0, 0))
+        if i % 37 == 0:
+            assert_same(world_map, objects[:i + 1])
+            world_map.danger_zones
+    assert_same(world_map, objects)
+    np.testing.assert_array_equal(positions(world_map.objects),
+                                  positions(objects))
+
+
+def test_batch_add_equals_single_adds() -> None:
+    """Objects added together merge like objects added one by one."""
+    objects = observations(200, 1)
+    single, batch = Map(THRESHOLD), Map(THRESHOLD)
+    robot = Point(0.5, -1, 0.3)
+    for obj in objects:
+        single.add_object(obj.copy(), robot)
+    for i in range(0, len(objects), 7):
+        batch.add_objects([o.copy() for o in objects[i:i + 7]], robot)
+    assert single.merge_objects()[1] == batch.merge_objects()[1]
+    for o_type in RigidType:
+        np.testing.assert_allclose(
+            positions(single.merge_objects()[0][o_type]),
+            positions(batch.merge_objects()[0][o_type]))
+
+
+def test_reset_forgets_merged_objects() -> None:
+    """Cached views are invalidated by reset."""
+    world_map = Map(THRESHOLD)
+    for obj in observations(50, 2):
+        world_map.add_object(obj, Point(0, 0, 0))
+    assert world_map.danger_zones
+    world_map.reset()
+    assert world_map.danger_zones == []
+    assert not world_map.objects
@@ -0,0 +1,59 @@
+"""Masked queries of ObservationStore against plain loops."""
+
+
+from geometry import Point
+import numpy as np
+from observations import ObservationStore
+from rigidobject import RigidObject, RigidType
+
+
+def filled_store(count: int, seed: int) -> tuple:
+    """
+    Create a store of random observations.
+
+    :param count: number of observations
+    :param seed: random seed
+    :return: the store and the observed objects
+    """
+    rng = np.random.default_rng(seed)
+    objects = []
+    for x, y, t in zip(*rng.uniform(-2, 2, (2, count)),
+                       rng.integers(1, len(RigidType) + 1, count)):
+        obj = RigidObject(0, 0, 0, 0, RigidType(int(t)))
+        obj.set_position(Point(float(x), float(y)))
+        objects.append(obj)
+    store = ObservationStore(capacity=4)
+    store.extend(objects[:count // 2],
+                 [o.xy for o in objects[:count // 2]], 1.0, 0)
+    for obj in objects[count // 2:]:
+        store.append(obj, 2.0, 1)
+    return store, objects
+
+
+def test_mask_and_within() -> None:
+    """Type masks and distance queries select the same as loops."""
+    store, objects = filled_store(301, 0)
+    center = Point(0.3, -0.2)
+    for o_type in RigidType:
+        np.testing.assert_array_equal(
+            np.flatnonzero(store.mask(o_type)),
+            [i for i, o in enumerate(objects) if o.o_type == o_type])
+        np.testing.assert_array_equal(
+            store.within(center, 0.7, o_type),
+            [i for i, o in enumerate(objects) if o.o_type == o_type and
+             o.position.distance(center) < 0.7])
+    assert len(store.within(center, 0.7)) == sum(
+        o.position.distance(center) < 0.7 for o in objects)
+
+
+def test_views_and_columns() -> None:
+    """Views rebuild the objects, pose ids and stamps are kept per row."""
+    store, objects = filled_store(20, 1)
+    views = store.views(store.mask(RigidType.BALL))
+    balls = [o for o in objects if o.o_type == RigidType.BALL]
+    np.testing.assert_array_equal([v.xy for v in views],
+                                  np.reshape([o.xy for o in balls], (-1, 2)))
+    np.testing.assert_array_equal(store.column("pose_id"),
+                                  [0] * 10 + [1] * 10)
+    np.testing.assert_array_equal(store.column("stamp"),
+                                  [1.0] * 10 + [2.0] * 10)
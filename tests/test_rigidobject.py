@@ -0,0 +1,106 @@
+"""Batched depth lookup and back-projection of depth images."""
+
+
+import warnings
+
+import numpy as np
+from rigidobject import (RigidObject, RigidType, assign_xy_batch,
+                         assign_xy_depth)
+
+
+SHAPE = (48, 64)
+K = np.array([[57.0, 0.0, 31.5], [0.0, 57.0, 23.5], [0.0, 0.0, 1.0]])
+
+
+def random_objects(count: int, rng: np.random.Generator) -> list:
+    """
+    Create objects at random image positions, borders included.
+
+    :param count: number of objects
+    :param rng: random generator
+    :return: list of RigidObject
+    """
+    us = rng.integers(0, SHAPE[1], count)
+    vs = rng.integers(0, SHAPE[0], count)
+    us[:2], vs[:2] = (0, SHAPE[1] - 1), (0, SHAPE[0] - 1)
+    return [RigidObject(int(u), int(v), 10, 10, RigidType.POLE)
+            for u, v in zip(us, vs)]
+
+
+def random_cloud(rng: np.random.Generator) -> np.ndarray:
+    """
+    Create a point cloud with invalid points and an invalid window.
+
+    :param rng: random generator
+    :return: point cloud of shape (*SHAPE, 3)
+    """
+    pc = rng.normal(0, 1, SHAPE + (3,))
+    pc[rng.random(SHAPE) < 0.2] = np.nan
+    pc[10:15, 20:25] = np.nan
+    return pc
+
+
+def window_median(pc: np.ndarray, u: int, v: int, half: int) -> tuple:
+    """
+    Get position from the window of one object pixel by pixel.
+
+    :param pc: point cloud
+    :param u: column of the object center
+    :param v: row of the object center
+    :param half: half size of the window in px
+    :return: x, y of the object, NaN without any valid pixel
+    """
+    xs, zs = [], []
+    for row in range(v - half, v + half + 1):
+        for col in range(u - half, u + half + 1):
+            x, _, z = pc[min(max(row, 0), SHAPE[0] - 1),
+                         min(max(col, 0), SHAPE[1] - 1)]
+            xs.append(x)
+            zs.append(z)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN windows
+        return np.nanmedian(zs), -np.nanmedian(xs)
+
+
+def test_batch_equals_pixelwise_median() -> None:
+    """Every object gets the median of its own clipped window."""
+    rng = np.random.default_rng(0)
+    pc = random_cloud(rng)
+    objects = random_objects(50, rng)
+    objects.append(RigidObject(22, 12, 5, 5, RigidType.BALL))
+    for half in (0, 1, 2):
+        assign_xy_batch(objects, pc, half)
+        np.testing.assert_array_equal(
+            [o.xy for o in objects],
+            [window_median(pc, o.im_p.x, o.im_p.y, half) for o in objects])
+    assert not objects[-1].is_valid()
+
+
+def test_depth_image_equals_point_cloud() -> None:
+    """Back-projected depth gives the positions of its point cloud."""
+    rng = np.random.default_rng(2)
+    depth = np.full(SHAPE, 1500, dtype=np.uint16)
+    z = depth * 0.001
+    u = np.arange(SHAPE[1])[None, :]
+    pc = np.stack(((u - K[0, 2]) * z / K[0, 0], np.zeros(SHAPE), z), axis=-1)
+    objects = [RigidObject(int(u), int(v), 10, 10, RigidType.POLE)
+               for u, v in zip(rng.integers(2, SHAPE[1] - 2, 30),
+                               rng.integers(2, SHAPE[0] - 2, 30))]
+    from_depth = [RigidObject(o.im_p.x, o.im_p.y, o.w, o.h, o.o_type)
+                  for o in objects]
+    assign_xy_batch(objects, pc)
+    assign_xy_depth(from_depth, depth, K)
+    np.testing.assert_allclose([o.xy for o in from_depth],
+                               [o.xy for o in objects], atol=1e-9)
+
+
+def test_depth_image_without_measurement() -> None:
+    """Zero depth is ignored, objects without any measurement are invalid."""
+    depth = np.full(SHAPE, 1500, dtype=np.uint16)
+    depth[::2] = 0
+    depth[10:15, 20:25] = 0
+    objects = [RigidObject(40, 30, 10, 10, RigidType.POLE),
+               RigidObject(22, 12, 5, 5, RigidType.BALL)]
+    assign_xy_depth(objects, depth, K)
+    assert objects[0].xy[0] == 1.5
+    assert not objects[1].is_valid()
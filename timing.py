@@ -0,0 +1,153 @@
+"""Timing statistics of control loops used in robot.py."""
+
+
+import time
+
+import numpy as np
+
+
+HISTOGRAM_RESOLUTION = 0.001
+HISTOGRAM_BINS = 250
+
+
+class Histogram:
+    """
+    Fixed-bin histogram of durations.
+
+    Adding a value is a single counter increment, values above the range
+    fall into the last bin and are accounted for by the maximum.
+    """
+
+    def __init__(self, resolution: float = HISTOGRAM_RESOLUTION,
+                 bins: int = HISTOGRAM_BINS) -> None:
+        """
+        Create Histogram instance.
+
+        :param resolution: width of a bin in seconds
+        :param bins: number of bins
+        """
+        self.resolution = resolution
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        if not self.count:
+            return "-"
+        return (f"mean {1000 * self.mean:.1f} / "
+                f"p95 {1000 * self.percentile(95):.1f} / "
+                f"max {1000 * self.max:.1f} ms")
+
+    def add(self, value: float) -> None:
+        """
+        Record one value.
+
+        :param value: duration in seconds, negative values count as zero
+        """
+        value = max(value, 0.0)
+        self.counts[min(int(value / self.resolution),
+                        len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    @property
+    def mean(self) -> float:
+        """
+        Get mean of recorded values.
+
+        :return: mean in seconds, 0 if empty
+        """
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimate percentile from the bins.
+
+        :param q: percentile between 0 and 100
+        :return: upper edge of the bin containing the percentile in seconds
+        """
+        if not self.count:
+            return 0.0
+        k = int(np.searchsorted(np.cumsum(self.counts),
+                                q / 100 * self.count))
+        return min((k + 1) * self.resolution, self.max)
+
+
+class LoopStats:
+    """
+    Timing of one control loop paced by a Rate.
+
+    Iteration is the time between two wake-ups, overshoot is how late the
+    Rate woke up after the deadline, a deadline is missed when the work
+    itself took longer than the period. Sensor age is the time from the
+    sensor reading to the end of the iteration.
+    """
+
+    def __init__(self, name: str, period: float,
+                 clock: any = time.monotonic) -> None:
+        """
+        Create LoopStats instance.
+
+        :param name: name of the loop
+        :param period: expected period of the loop in seconds
+        :param clock: function returning current time in seconds
+        """
+        self.name = name
+        self.period = period
+        self.clock = clock
+        self.iteration = Histogram()
+        self.work = Histogram()
+        self.overshoot = Histogram()
+        self.sensor_age = Histogram()
+        self.missed = 0
+        self.last_wake = None
+
+    def __repr__(self) -> str:
+        """Return string representation of object."""
+        missed = 100 * self.missed / max(self.iteration.count, 1)
+        return (f"{self.name}: {self.iteration.count} iterations, "
+                f"{self.missed} missed ({missed:.1f} %)\n"
+                f"  iteration  {self.iteration}\n"
+                f"  work       {self.work}\n"
+                f"  overshoot  {self.overshoot}\n"
+                f"  sensor age {self.sensor_age}")
+
+    def begin(self) -> None:
+        """Mark start of the loop, time between loops is not counted."""
+        self.last_wake = self.clock()
+
+    def sleep(self, rate: any, sensor_stamp: float = None) -> None:
+        """
+        Finish an iteration by sleeping with rate and record its timing.
+
+        :param rate: rate instance pacing the loop
+        :param sensor_stamp: time of the sensor data used in the iteration
+        """
+        now = self.clock()
+        if self.last_wake is None:
+            self.last_wake = now
+        if sensor_stamp is not None:
+            self.sensor_age.add(now - sensor_stamp)
+        work = now - self.last_wake
+        rate.sleep()
+        wake = self.clock()
+        self.work.add(work)
+        self.iteration.add(wake - self.last_wake)
+        if work > self.period:
+            self.missed += 1
+        else:
+            self.overshoot.add(wake - self.last_wake - self.period)
+        self.last_wake = wake
+
+
+def report(stats: dict) -> str:
+    """
+    Format statistics of all loops.
+
+    :param stats: dictionary of LoopStats by loop name
+    :return: multiline report
+    """
+    return "\n".join(str(s) for s in stats.values() if s.iteration.count)